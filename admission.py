@@ -0,0 +1,199 @@
+# admission.py
+# Admission control for the webhook. Dialogflow gives up on a webhook after
+# about 5 seconds, so a request that cannot be answered in time is better
+# answered immediately with a fallback than processed for nobody.
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+# Reasons a request was shed, used as metric labels
+SHED_QUEUE_FULL = "queue_full"
+SHED_DEADLINE = "deadline"
+
+
+class AdmissionController:
+    """
+    Limits how many requests run at once and queues the rest in arrival order.
+    A request is answered with the fallback body instead of being processed
+    when the queue is full, when the requests that reached this worker before
+    it would, one after another, not leave it time to finish before the
+    deadline, or once it has waited past the deadline.
+
+    The estimate is serial on purpose: a worker runs its handlers on one event
+    loop, so requests waiting for the loop cost as much as requests waiting
+    for a slot. service_seconds is the average time between two completions
+    while the worker is busy, i.e. the inverse of its throughput.
+    """
+
+    def __init__(
+        self,
+        fallback_body: bytes,
+        max_in_flight: int = 64,
+        max_queue: int = 1024,
+        deadline_seconds: float = 5.0,
+        safety_margin_seconds: float = 0.5,
+    ):
+        self.fallback_body = fallback_body
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        # Time we allow ourselves, leaving room for the network and Dialogflow
+        self.budget_seconds = deadline_seconds - safety_margin_seconds
+        self.in_flight = 0
+        # Requests that reached the middleware and have not finished or been shed
+        self.pending = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self._enqueued_at: Dict["asyncio.Future[None]", float] = {}
+        # Exponentially weighted average of the time between completions
+        self.service_seconds = 0.001
+        self._last_done = 0.0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {SHED_QUEUE_FULL: 0, SHED_DEADLINE: 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._enqueued_at)
+
+    def oldest_queue_age(self) -> float:
+        if not self._enqueued_at:
+            return 0.0
+        return time.monotonic() - min(self._enqueued_at.values())
+
+    async def acquire(self, arrived: float) -> Optional[str]:
+        """
+        Waits for a slot for a request that reached the worker at `arrived`
+        (time.monotonic()). Returns None once admitted, or the reason the
+        request should be shed instead. An admitted request must call
+        release() when it finishes.
+        """
+        ahead = self.pending
+        if ahead - self.in_flight >= self.max_queue:
+            return self._shed(SHED_QUEUE_FULL)
+        if (ahead + 1) * self.service_seconds > self.budget_seconds:
+            return self._shed(SHED_DEADLINE)
+
+        self.pending += 1
+        try:
+            # Let the requests that arrived in the same burst be counted before
+            # any of them starts running on the loop
+            await asyncio.sleep(0)
+            remaining = self.budget_seconds - (time.monotonic() - arrived) - self.service_seconds
+            if remaining <= 0:
+                self.pending -= 1
+                return self._shed(SHED_DEADLINE)
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                return None
+            if self.queued >= self.max_queue:
+                self.pending -= 1
+                return self._shed(SHED_QUEUE_FULL)
+            admitted = await self._wait_for_slot(remaining)
+        except asyncio.CancelledError:
+            self.pending -= 1
+            raise
+        if admitted:
+            self.admitted += 1
+            return None
+        self.pending -= 1
+        return self._shed(SHED_DEADLINE)
+
+    async def _wait_for_slot(self, timeout: float) -> bool:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._enqueued_at[waiter] = time.monotonic()
+        try:
+            await asyncio.wait((waiter,), timeout=timeout)
+        except asyncio.CancelledError:
+            # The client went away while queued. If a finishing request had
+            # already handed us its slot, pass it on instead of losing it.
+            if waiter.done():
+                self._hand_over()
+            else:
+                self._forget(waiter)
+            raise
+        finally:
+            self._enqueued_at.pop(waiter, None)
+        if waiter.done():
+            # A finishing request handed its slot over to us
+            return True
+        self._forget(waiter)
+        return False
+
+    def _forget(self, waiter: "asyncio.Future[None]") -> None:
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, started: float) -> None:
+        """Records that a request admitted at `started` finished and frees its slot."""
+        now = time.monotonic()
+        # While busy this is the gap since the previous completion; after an
+        # idle spell it is this request's own processing time.
+        interval = now - max(self._last_done, started)
+        self.service_seconds += 0.2 * (interval - self.service_seconds)
+        self._last_done = now
+        self.pending -= 1
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot passes straight to the next request
+                return
+        self.in_flight -= 1
+
+    def _shed(self, reason: str) -> str:
+        self.shed[reason] += 1
+        return reason
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to one path.
+    Shed requests get a 200 with the fallback body so Dialogflow still shows
+    the user a reply, plus an x-load-shed header naming the reason.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, path: str = "/webhook"):
+        self.app = app
+        self.controller = controller
+        self.path = path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        reason = await controller.acquire(time.monotonic())
+        if reason is not None:
+            await self._send_fallback(send, reason)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(started)
+
+    async def _send_fallback(self, send: Send, reason: str) -> None:
+        body = self.controller.fallback_body
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"x-load-shed", reason.encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
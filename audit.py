@@ -0,0 +1,245 @@
+# audit.py
+# An append-only record of every decision the webhook makes, for auditors.
+# Records are pushed onto a bounded in-memory queue (like logger.py), so the
+# request handler never waits for the disk; a background thread writes them
+# as JSON lines to segment files and fsyncs once per batch (group commit):
+# while one fsync is in progress the next batch gathers in the queue, so the
+# busier the service, the more records share each fsync.
+#
+# Segments are named audit-<UTC time>-<pid>-<sequence>.jsonl, so every worker
+# process writes its own files and they sort by the time they were opened. A
+# segment is closed and a new one started once it reaches segment_bytes. With
+# compression="zstd" (needs the zstandard package) each batch is written as
+# its own zstd frame, so a segment is readable up to its last fsync even if
+# the process dies mid-segment.
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; only compressed segments need it
+    zstandard = None
+
+COMPRESSIONS = ("none", "zstd")
+
+SEGMENT_PREFIX = "audit-"
+
+Record = Tuple[float, Dict[str, Any]]
+
+
+class AuditLog:
+    """
+    Writes audit records to segment files under `directory`.
+    When the queue is full records are dropped (and counted) rather than
+    making the caller wait; every outcome of a record is counted in stats().
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        compression: str = "none",
+        max_queue: int = 100000,
+        batch_size: int = 4096,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"compression must be one of {', '.join(COMPRESSIONS)}")
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd compressed audit segments need the zstandard package installed")
+        if segment_bytes < 1:
+            raise ValueError("segment_bytes must be positive")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compression = compression
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.commits = 0
+        self.segments = 0
+        self._queue: "queue.Queue[Record]" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        # Held while a batch is written, so flush() and the writer never interleave
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_size = 0
+        self._sequence = 0
+        self._compressor = zstandard.ZstdCompressor() if compression == "zstd" else None
+        atexit.register(self.flush)
+
+    def record(self, **fields: Any) -> None:
+        """
+        Queues one record; fields must be JSON-serializable (others are
+        written with str()).
+        """
+        if self._writer_pid != os.getpid():
+            # Threads do not survive a fork, so each worker starts its own writer
+            self._start_writer()
+        try:
+            self._queue.put_nowait((time.time(), fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """
+        Writes out and fsyncs everything still queued, then closes the current
+        segment (the next record opens a new one). Called at interpreter exit.
+        """
+        with self._lock:
+            while True:
+                batch = self._drain([])
+                if not batch:
+                    break
+                self._write(batch)
+            self._close_segment()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "written": self.written, "dropped": self.dropped, "failed": self.failed,
+            "commits": self.commits, "segments": self.segments,
+        }
+
+    # --- Background writer ---
+    def _start_writer(self) -> None:
+        self._writer_pid = os.getpid()
+        # A segment inherited over a fork belongs to the parent; start our own
+        self._lock = threading.Lock()
+        self._segment = None
+        self._writer = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._writer.start()
+
+    def _drain(self, batch: List[Record]) -> List[Record]:
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            # Everything queued during the previous fsync goes into this batch
+            batch = self._drain([self._queue.get()])
+            with self._lock:
+                self._write(batch)
+
+    def _write(self, batch: List[Record]) -> None:
+        lines = []
+        for timestamp, fields in batch:
+            record = {"ts": round(timestamp, 6)}
+            record.update(fields)
+            try:
+                lines.append(json.dumps(record, default=str, ensure_ascii=False))
+            except (TypeError, ValueError, RecursionError, RuntimeError):
+                # e.g. non-string keys or a circular reference; the rest of the batch still goes in
+                self.failed += 1
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        try:
+            if self._segment is not None and self._segment_size + len(data) > self.segment_bytes:
+                self._close_segment()
+            if self._segment is None:
+                self._open_segment()
+            self._segment.write(data)
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+        except OSError as exc:  # e.g. a full disk; start a fresh segment next time
+            self.failed += len(lines)
+            self._abandon_segment()
+            if self.on_error is not None:
+                self.on_error(exc)
+            return
+        self._segment_size += len(data)
+        self.written += len(lines)
+        self.commits += 1
+
+    # --- Segments ---
+    def _open_segment(self) -> None:
+        self._sequence += 1
+        stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        suffix = ".jsonl.zst" if self._compressor is not None else ".jsonl"
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{stamp}-{os.getpid()}-{self._sequence:06d}{suffix}")
+        # "x": never append to (or truncate) a segment someone else wrote
+        self._segment = open(path, "xb")
+        self._segment_size = 0
+        self.segments += 1
+        # Make the new directory entry durable too, not just the file's contents
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _close_segment(self) -> None:
+        if self._segment is None:
+            return
+        try:
+            self._segment.close()
+        except OSError as exc:
+            if self.on_error is not None:
+                self.on_error(exc)
+        self._segment = None
+
+    def _abandon_segment(self) -> None:
+        segment, self._segment = self._segment, None
+        if segment is not None:
+            try:
+                segment.close()
+            except OSError:
+                pass
+
+
+def segment_paths(directory: str) -> List[str]:
+    """
+    The segments in `directory`, oldest first.
+    """
+    return sorted(glob.glob(os.path.join(directory, SEGMENT_PREFIX + "*.jsonl*")), key=os.path.basename)
+
+
+def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the records of one segment, compressed or not. A line cut short
+    by a crash ends the segment.
+    """
+    with open(path, "rb") as handle:
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("reading zstd compressed audit segments needs the zstandard package installed")
+            raw = zstandard.ZstdDecompressor().stream_reader(handle, read_across_frames=True).read()
+        else:
+            raw = handle.read()
+    for line in raw.splitlines():
+        try:
+            yield json.loads(line)
+        except ValueError:
+            return
+
+
+def get_audit_log(on_error: Optional[Callable[[Exception], None]] = None) -> Optional[AuditLog]:
+    """
+    Builds an audit log from AUDIT_LOG_DIR, AUDIT_SEGMENT_BYTES,
+    AUDIT_COMPRESSION and AUDIT_QUEUE_SIZE, or None when AUDIT_LOG_DIR is unset.
+    """
+    directory = os.getenv("AUDIT_LOG_DIR")
+    if not directory:
+        return None
+    return AuditLog(
+        directory,
+        segment_bytes=int(os.getenv("AUDIT_SEGMENT_BYTES", str(64 * 1024 * 1024))),
+        compression=os.getenv("AUDIT_COMPRESSION", "none").lower(),
+        max_queue=int(os.getenv("AUDIT_QUEUE_SIZE", "100000")),
+        on_error=on_error,
+    )
@@ -0,0 +1,89 @@
+# batch.py
+# Plumbing for the batch eligibility endpoint: parse a JSON array or an NDJSON
+# body of applicants, evaluate them a chunk at a time and stream the results
+# back as NDJSON.
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List
+
+try:
+    import orjson
+
+    def _dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the standard library
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    _loads = json.loads
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines")
+
+# Applicants evaluated (and results written) per pass
+CHUNK_SIZE = 1024
+
+# Called with a chunk of records and the batch index of its first record
+ChunkEvaluator = Callable[[List[Any], int], List[Dict[str, Any]]]
+
+
+def is_ndjson(content_type: str) -> bool:
+    return content_type.split(";", 1)[0].strip().lower() in NDJSON_CONTENT_TYPES
+
+
+def parse_json_array(body: bytes) -> List[Any]:
+    """
+    Parses a JSON array body; raises ValueError for anything else.
+    """
+    records = _loads(body)
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of applicants.")
+    return records
+
+
+def iter_ndjson(body: bytes) -> Iterator[Any]:
+    """
+    Lazily yields one parsed record per non-empty line of an NDJSON body.
+    Lines that are not valid JSON are yielded as None so the evaluator can
+    report them in place instead of aborting the whole batch.
+    """
+    start = 0
+    length = len(body)
+    while start < length:
+        end = body.find(b"\n", start)
+        if end == -1:
+            end = length
+        line = body[start:end]
+        start = end + 1
+        if line.strip():
+            yield _parse_line(line)
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return _loads(line)
+    except ValueError:
+        return None
+
+
+def _chunk_to_ndjson(results: Iterable[Dict[str, Any]]) -> bytes:
+    return b"".join(_dumps(result) + b"\n" for result in results)
+
+
+async def stream_results(records: Iterable[Any], evaluate: ChunkEvaluator) -> AsyncIterator[bytes]:
+    """
+    Groups records into chunks of CHUNK_SIZE, evaluates each chunk in one pass
+    and yields its results as a single NDJSON block, so the response starts
+    streaming before the whole batch has been scored.
+    """
+    chunk: List[Any] = []
+    start = 0
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= CHUNK_SIZE:
+            yield _chunk_to_ndjson(evaluate(chunk, start))
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield _chunk_to_ndjson(evaluate(chunk, start))
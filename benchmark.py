@@ -0,0 +1,320 @@
+# benchmark.py
+# Micro- and end-to-end benchmarks for every stage of the webhook pipeline.
+#
+#   python benchmark.py                        # run everything, print a table
+#   python benchmark.py -k decode -o run.json  # run matching benchmarks, save JSON
+#   python benchmark.py --compare before.json  # show the change against an earlier run
+#
+# Micro-benchmarks time calibrated loops and report per-call statistics over
+# several rounds; end-to-end benchmarks time every ASGI request individually
+# so their p99 reflects real per-request variance.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# Keep per-request log lines out of the measurements and the report
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import main
+from numeric import parse_number, parse_text
+from qualification import classify_qualification, classify_text
+
+# Output context counts the decode and merge stages are measured at
+CONTEXT_COUNTS = (0, 5, 50)
+
+# Each micro-benchmark round runs for about this long
+ROUND_SECONDS = 0.05
+
+
+# --- Realistic Dialogflow payloads ---
+def make_context(index: int, name: str) -> Dict[str, Any]:
+    return {
+        "name": f"projects/loan-bot/agent/sessions/7f3c9a2e-1b4d/contexts/{name}",
+        "lifespanCount": 5,
+        "parameters": {
+            "loan-type": "home",
+            "loan-type.original": "home loan",
+            "age": 29,
+            "age.original": "29",
+            "income": {"amount": 45000, "currency": "INR"},
+            "income.original": "45k rupees",
+            "qualification": "",
+            "qualification.original": "",
+            "number": [29],
+            "number.original": ["29"],
+            "turn": index,
+        },
+    }
+
+
+def make_payload(context_count: int) -> Dict[str, Any]:
+    """
+    A webhook body shaped like the ones Dialogflow ES sends: the loan details
+    context plus `context_count - 1` unrelated contexts, and the usual
+    fulfillment messages, sentiment and diagnostic info.
+    """
+    contexts = []
+    if context_count:
+        contexts.append(make_context(0, main.LOAN_DETAILS_CONTEXT))
+        contexts.extend(make_context(index, f"unrelated-context-{index}") for index in range(1, context_count))
+    return {
+        "responseId": "c4b0a5f2-8e1d-4f7a-9c3e-2d6b1a0f9e87-0820055c",
+        "session": "projects/loan-bot/agent/sessions/7f3c9a2e-1b4d",
+        "queryResult": {
+            "queryText": "I am 29 and I earn 45000 a month",
+            "parameters": {"age": 29, "income": {"amount": 45000, "currency": "INR"}, "number": [29, 45000]},
+            "allRequiredParamsPresent": True,
+            "fulfillmentText": "",
+            "fulfillmentMessages": [{"text": {"text": [""]}}],
+            "outputContexts": contexts,
+            "intent": {
+                "name": "projects/loan-bot/agent/intents/0f7d2c1e-5a3b-4c8d-9e2f-1a6b7c8d9e0f",
+                "displayName": "Loan Details",
+            },
+            "intentDetectionConfidence": 0.93,
+            "diagnosticInfo": {"webhook_latency_ms": 120, "end_conversation": False},
+            "sentimentAnalysisResult": {"queryTextSentiment": {"score": 0.2, "magnitude": 0.2}},
+            "languageCode": "en",
+        },
+        "originalDetectIntentRequest": {"source": "telegram", "payload": {"data": {"chat": {"id": 123456789}}}},
+    }
+
+
+def encode(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload).encode("utf-8")
+
+
+# --- Registry ---
+# (name, kind, target): micro targets are callables, end-to-end targets request bodies
+Case = Tuple[str, str, Union[Callable[[], Any], bytes]]
+CASES: List[Case] = []
+
+
+def micro(name: str, function: Callable[[], Any]) -> None:
+    CASES.append((name, "micro", function))
+
+
+def end_to_end(name: str, body: bytes) -> None:
+    CASES.append((name, "e2e", body))
+
+
+def _fast_decode(body: bytes) -> Callable[[], Any]:
+    def run():
+        main.FAST_DECODE = True
+        try:
+            return main.decode_webhook_request(body)
+        finally:
+            main.FAST_DECODE = False
+    return run
+
+
+def _int_or_crash(value: Any) -> Any:
+    # What the handler used to do: int() and, for free text, an exception
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Ages and incomes as users type them
+NUMERIC_INPUTS = (45000, "45000", "45,000", "50k", "5 lakh", "₹30000", "30000.0")
+
+# Qualifications as users type them
+QUALIFICATION_INPUTS = ("graduate", "B.Tech", "not a graduate", "I completed my MBA last year")
+
+
+def register_cases() -> None:
+    params = main.get_merged_parameters(main.WebhookRequest.model_validate(make_payload(1)).query_result)
+    micro("determine_loan_type", lambda: main.determine_loan_type(params))
+    micro("get_parameter", lambda: main.get_parameter(params, 'income', fallback_name='number'))
+    for value in NUMERIC_INPUTS:
+        micro(f"numeric.int_or_crash[{value}]", lambda value=value: _int_or_crash(value))
+        micro(f"numeric.parse[{value}]", lambda value=value: parse_number(value))
+        if isinstance(value, str):
+            micro(f"numeric.parse_uncached[{value}]", lambda value=value: parse_text.__wrapped__(value))
+    for value in QUALIFICATION_INPUTS:
+        micro(f"qualification.classify[{value}]", lambda value=value: classify_qualification(value))
+        micro(f"qualification.classify_uncached[{value}]", lambda value=value: classify_text.__wrapped__(value))
+
+    snapshot = main.RULE_STORE.current
+    micro("rules.evaluate", lambda: snapshot.rules.evaluate("home", 29, 45000, None))
+    cache = main.DecisionCache()
+    micro("decision_cache.evaluate", lambda: cache.evaluate(snapshot.rules, "home", 29, 45000, None))
+    affordability = main.AFFORDABILITY.get(snapshot.rules, main.RATES.current)
+    micro("affordability.describe", lambda: affordability.describe("home", 29, 45000))
+    micro("rate_catalog.rate", lambda: main.RATES.current.rate("home", 45000, 240))
+
+    from starlette.responses import JSONResponse
+    decision = snapshot.rules.evaluate("home", 29, 45000, None)
+    micro("serialize.json_response", lambda: JSONResponse({"fulfillmentText": decision.response_text}))
+    micro("serialize.catalog", lambda: main.Response(snapshot.responses.body(decision, "en-IN"), media_type="application/json"))
+
+    for count in CONTEXT_COUNTS:
+        body = encode(make_payload(count))
+        request = main.WebhookRequest.model_validate_json(body)
+        micro(f"decode.pydantic[{count}]", lambda body=body: main.WebhookRequest.model_validate_json(body))
+        micro(f"decode.fast[{count}]", _fast_decode(body))
+        micro(f"get_merged_parameters[{count}]", lambda request=request: main.get_merged_parameters(request.query_result))
+        micro(f"process_webhook_request[{count}]", lambda request=request: main.process_webhook_request(request))
+        end_to_end(f"asgi.webhook[{count}]", body)
+
+
+# --- Runners ---
+def _calibrate(function: Callable[[], Any]) -> int:
+    """
+    Finds a loop count that makes one round last about ROUND_SECONDS.
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= ROUND_SECONDS / 10:
+            return max(1, int(loops * ROUND_SECONDS / elapsed))
+        loops *= 10
+
+
+def run_micro(function: Callable[[], Any], rounds: int) -> Dict[str, Any]:
+    loops = _calibrate(function)
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter_ns()
+        for _ in range(loops):
+            function()
+        samples.append((time.perf_counter_ns() - started) / loops)
+    return _summarise(samples, loops)
+
+
+def run_end_to_end(body: bytes, requests: int) -> Dict[str, Any]:
+    """
+    Sends `requests` webhook calls through an in-process ASGI client and times
+    each one, including routing, decoding and response serialisation.
+    """
+    import httpx
+
+    async def drive() -> List[float]:
+        transport = httpx.ASGITransport(app=main.app)
+        headers = {"content-type": "application/json"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for _ in range(min(50, requests)):  # warm up
+                await client.post("/webhook", content=body, headers=headers)
+            samples = []
+            for _ in range(requests):
+                started = time.perf_counter_ns()
+                response = await client.post("/webhook", content=body, headers=headers)
+                samples.append(time.perf_counter_ns() - started)
+                response.raise_for_status()
+            return samples
+
+    return _summarise(asyncio.run(drive()), 1)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _summarise(samples_ns: List[float], loops: int) -> Dict[str, Any]:
+    ordered = sorted(samples_ns)
+    mean = statistics.fmean(ordered)
+    return {
+        "samples": len(ordered),
+        "loops": loops,
+        "min_ns": round(ordered[0], 1),
+        "median_ns": round(statistics.median(ordered), 1),
+        "mean_ns": round(mean, 1),
+        "p99_ns": round(_percentile(ordered, 0.99), 1),
+        "stdev_ns": round(statistics.pstdev(ordered), 1),
+        "ops_per_sec": round(1e9 / mean, 1) if mean else None,
+    }
+
+
+# --- Reporting ---
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format_ns(value: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f} {unit}"
+    return f"{value:.0f} ns"
+
+
+def print_table(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    header = f"{'benchmark':<34} {'median':>10} {'p99':>10} {'ops/s':>12}"
+    if baseline:
+        header += f" {'vs base':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        line = (
+            f"{name:<34} {_format_ns(result['median_ns']):>10} "
+            f"{_format_ns(result['p99_ns']):>10} {result['ops_per_sec'] or 0:>12,.0f}"
+        )
+        if baseline:
+            before = baseline.get(name)
+            if before:
+                line += f" {result['median_ns'] / before['median_ns']:>8.2f}x"
+            else:
+                line += f" {'new':>9}"
+        print(line)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the webhook pipeline stage by stage.")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this text")
+    parser.add_argument("-o", "--output", help="save results as JSON to this path")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare medians against")
+    parser.add_argument("--rounds", type=int, default=20, help="rounds per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per end-to-end benchmark")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    register_cases()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, kind, target in CASES:
+        if args.filter not in name:
+            continue
+        if kind == "micro":
+            results[name] = run_micro(target, args.rounds)
+        else:
+            results[name] = run_end_to_end(target, args.requests)
+        results[name]["kind"] = kind
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)["results"]
+    print_table(results, baseline)
+
+    if args.output:
+        report = {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,73 @@
+# contexts.py
+# Selecting the Dialogflow output contexts whose parameters the webhook merges.
+# Contexts arrive as full resource paths
+# (projects/<project>/agent/sessions/<session>/contexts/<name>), but only the
+# last path segment, the short name, identifies them.
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+
+def short_name(name: str) -> str:
+    return name.rpartition("/")[2]
+
+
+def _add(index: Dict[str, Dict[str, Any]], name: str, parameters: Dict[str, Any]) -> None:
+    # A context sent twice is merged in the order received, as before
+    existing = index.get(name)
+    index[name] = parameters if existing is None else {**existing, **parameters}
+
+
+class ContextSelector:
+    """
+    Matches contexts by exact short name and merges their parameters in
+    priority order (`names` lists the highest priority first, so its
+    parameters win over the others').
+    """
+
+    def __init__(self, names: Sequence[str]):
+        self.names = tuple(names)
+        # Lowest priority is merged first, so later (higher) ones overwrite it
+        self._merge_order = tuple(reversed(self.names))
+
+    def wants(self, name: str) -> bool:
+        return short_name(name) in self.names
+
+    def index(self, contexts: Optional[Iterable[Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Maps the short name of every wanted context that has parameters to
+        those parameters, in a single pass. A substring test for each wanted
+        name (the cheapest check in CPython) screens out unrelated contexts
+        before the exact comparison.
+        """
+        index: Dict[str, Dict[str, Any]] = {}
+        if not contexts:
+            return index
+        names = self.names
+        if len(names) == 1:
+            # The usual configuration, without the inner loop
+            wanted = names[0]
+            for context in contexts:
+                name = context.name
+                if wanted in name and short_name(name) == wanted and context.parameters:
+                    _add(index, wanted, context.parameters)
+            return index
+        for context in contexts:
+            name = context.name
+            for wanted in names:
+                if wanted in name and short_name(name) == wanted:
+                    if context.parameters:
+                        _add(index, wanted, context.parameters)
+                    break
+        return index
+
+    def merge(self, contexts: Optional[Iterable[Any]], into: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Updates `into` with the wanted contexts' parameters: one lookup per
+        configured name, however many contexts there are.
+        """
+        index = self.index(contexts)
+        if index:
+            for name in self._merge_order:
+                parameters = index.get(name)
+                if parameters:
+                    into.update(parameters)
+        return into
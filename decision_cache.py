@@ -0,0 +1,129 @@
+# decision_cache.py
+# Memoizes eligibility decisions. A decision only depends on which side of
+# each threshold the inputs fall, so ages and incomes are reduced to the
+# interval between a product's thresholds, qualifications to whether they meet
+# the minimum level, and the cache key space stays tiny.
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from qualification import classify_qualification, parse_level
+from rules import Decision, RuleSet
+
+KeyPart = Callable[[Any], Hashable]
+
+
+def _bucket(bounds: Tuple[int, ...]) -> KeyPart:
+    """
+    Maps a value to the number of bounds it is >= to, after int() like the
+    rules apply. Two values in the same bucket pass exactly the same
+    `>= min` and `<= max` checks.
+    """
+    def part(value: Any) -> Hashable:
+        return None if value is None else bisect_right(bounds, int(value))
+    return part
+
+
+def _presence(value: Any) -> Hashable:
+    return value is None
+
+
+def _ignored(value: Any) -> Hashable:
+    return 0
+
+
+def _numeric_part(spec: Dict[str, Any], field: str, min_key: str, max_key: Optional[str]) -> KeyPart:
+    bounds = set()
+    if spec.get(min_key) is not None:
+        bounds.add(spec[min_key])
+    if max_key and spec.get(max_key) is not None:
+        bounds.add(spec[max_key] + 1)  # value <= max is value < max + 1
+    if bounds:
+        return _bucket(tuple(sorted(bounds)))
+    return _presence if field in spec["required"] else _ignored
+
+
+def _qualification_part(spec: Dict[str, Any]) -> KeyPart:
+    if spec.get("qualification") is not None:
+        minimum = parse_level(spec["qualification"])
+        return lambda value: None if value is None else classify_qualification(value) >= minimum
+    return _presence if "qualification" in spec["required"] else _ignored
+
+
+def compile_key(loan_type: str, spec: Dict[str, Any]) -> Callable[[Any, Any, Any], Tuple[Hashable, ...]]:
+    """
+    Builds the function turning (age, income, qualification) into a cache key
+    for one product: each field keeps only what that product's rule looks at.
+    """
+    age_part = _numeric_part(spec, "age", "min_age", "max_age")
+    income_part = _numeric_part(spec, "income", "min_income", None)
+    qualification_part = _qualification_part(spec)
+
+    def key(age: Any, income: Any, qualification: Any) -> Tuple[Hashable, ...]:
+        return loan_type, age_part(age), income_part(income), qualification_part(qualification)
+
+    return key
+
+
+class DecisionCache:
+    """
+    A bounded LRU of decisions in front of a RuleSet. Passing a different
+    RuleSet (e.g. after the rules were reloaded) clears the cache and
+    rebuilds the key functions from the new product table. Inputs the rules
+    cannot convert bypass the cache so errors surface exactly as before.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._rules: Optional[RuleSet] = None
+        self._keys: Dict[str, Callable[[Any, Any, Any], Tuple[Hashable, ...]]] = {}
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Decision]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self, rules: RuleSet) -> None:
+        if self._rules is not None:
+            self.invalidations += 1
+        self._rules = rules
+        self._keys = {loan_type: compile_key(loan_type, spec) for loan_type, spec in rules.products.items()}
+        self._entries.clear()
+
+    def evaluate(self, rules: RuleSet, loan_type: Optional[str], age: Any, income: Any, qualification: Any) -> Decision:
+        if rules is not self._rules:
+            self._load(rules)
+        make_key = self._keys.get(loan_type) if isinstance(loan_type, str) else None
+        if make_key is None:
+            # Unknown loan types are a single dict miss in the rules already
+            return rules.evaluate(loan_type, age, income, qualification)
+        try:
+            key = make_key(age, income, qualification)
+        except (TypeError, ValueError, OverflowError):
+            self.bypasses += 1
+            return rules.evaluate(loan_type, age, income, qualification)
+
+        entries = self._entries
+        decision = entries.get(key)
+        if decision is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return decision
+        self.misses += 1
+        decision = rules.evaluate(loan_type, age, income, qualification)
+        entries[key] = decision
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return decision
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,88 @@
+# decoding.py
+# Fast-path decoding of Dialogflow webhook bodies.
+# Only the fields the webhook actually reads are extracted; everything else
+# (fulfillmentMessages, diagnosticInfo, sentiment, unrelated contexts) is skipped
+# without being validated.
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:  # orjson is optional; the standard library parser still works
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+
+# Lightweight stand-ins for the Pydantic models in main.py. They expose the same
+# attribute names, so the webhook logic works on either, but cost a fraction of
+# even an unvalidated model_construct() to build.
+class DecodedContext(NamedTuple):
+    name: str
+    parameters: Dict[str, Any]
+
+
+class DecodedQueryResult(NamedTuple):
+    parameters: Dict[str, Any]
+    intent: Dict[str, Any]
+    output_contexts: List[DecodedContext]
+    language_code: Optional[str]
+
+
+class DecodedRequest(NamedTuple):
+    session: Optional[str]
+    query_result: DecodedQueryResult
+
+
+def fast_decode(body: bytes, wants_context: Callable[[str], bool]) -> Optional[DecodedRequest]:
+    """
+    Extracts the session, parameters, intent, language code and the parameters
+    of every output context whose name `wants_context` accepts from a raw
+    webhook body.
+    Returns None whenever the body does not have the expected shape, so the
+    caller can fall back to full Pydantic validation and its error reporting.
+    """
+    try:
+        payload = _loads(body)
+    except ValueError:  # orjson.JSONDecodeError and json.JSONDecodeError both subclass it
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    session = payload.get("session")
+    if session is not None and not isinstance(session, str):
+        return None
+
+    query_result = payload.get("queryResult")
+    if not isinstance(query_result, dict):
+        return None
+    parameters = query_result.get("parameters")
+    intent = query_result.get("intent")
+    if not isinstance(parameters, dict) or not isinstance(intent, dict):
+        return None
+    language_code = query_result.get("languageCode")
+    if language_code is not None and not isinstance(language_code, str):
+        return None
+
+    contexts: List[DecodedContext] = []
+    output_contexts = query_result.get("outputContexts")
+    if output_contexts is not None:
+        if not isinstance(output_contexts, list):
+            return None
+        for context in output_contexts:
+            if not isinstance(context, dict):
+                return None
+            name = context.get("name")
+            if not isinstance(name, str):
+                return None
+            if not wants_context(name):
+                continue
+            context_parameters = context.get("parameters")
+            if context_parameters is None:
+                context_parameters = {}
+            elif not isinstance(context_parameters, dict):
+                return None
+            contexts.append(DecodedContext(name, context_parameters))
+
+    return DecodedRequest(session, DecodedQueryResult(parameters, intent, contexts, language_code))
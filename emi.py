@@ -0,0 +1,256 @@
+# emi.py
+# EMI (equated monthly instalment), total interest and amortization schedules.
+#
+# A single quote for a chat reply is plain float arithmetic; comparison tables
+# and schedules are computed with NumPy over every (principal, annual rate,
+# tenure) combination at once, so a table of thousands of quotes costs about
+# as much as a handful of Python-level ones. Both use the same closed form,
+# EMI = P * r * (1 + r)^n / ((1 + r)^n - 1) with r the monthly rate, written
+# with log1p/expm1 so small rates keep their precision.
+import math
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from numeric import parse_number
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; single quotes still work, tables need it
+    np = None
+
+# Longest tenure quoted, in months (50 years)
+MAX_TENURE_MONTHS = 600
+MAX_ANNUAL_RATE = 100.0
+
+# A bare tenure number up to this is read as years ("5"), above it as months ("60")
+BARE_TENURE_MAX_YEARS = 30
+
+# Dialogflow @sys.duration units, and the words users type, in months
+TENURE_UNITS = {
+    "mo": 1, "mon": 1, "month": 1, "months": 1,
+    "yr": 12, "yrs": 12, "year": 12, "years": 12, "y": 12,
+}
+_TENURE = re.compile(r"(?P<number>\d+(?:\.\d+)?)\s*(?P<unit>[a-z]+)?")
+
+
+# --- Single quotes ---
+def _check_terms(principal: float, annual_rate: float, months: float) -> None:
+    if not (math.isfinite(principal) and principal > 0):
+        raise ValueError("principal must be a positive amount")
+    if not (math.isfinite(annual_rate) and 0 <= annual_rate <= MAX_ANNUAL_RATE):
+        raise ValueError(f"annual_rate must be a percentage between 0 and {MAX_ANNUAL_RATE:g}")
+    if months != int(months) or not 1 <= months <= MAX_TENURE_MONTHS:
+        raise ValueError(f"tenure_months must be a whole number of months from 1 to {MAX_TENURE_MONTHS}")
+
+
+def monthly_instalment(principal: float, annual_rate: float, months: int) -> float:
+    """
+    The EMI for one loan; `annual_rate` is a percentage, e.g. 8.5.
+    Raises ValueError for terms that cannot be quoted.
+    """
+    _check_terms(principal, annual_rate, months)
+    rate = annual_rate / 1200
+    if rate == 0:
+        return principal / months
+    return principal * rate / -math.expm1(-months * math.log1p(rate))
+
+
+def parse_tenure_months(value: Any, max_months: int = MAX_TENURE_MONTHS) -> Optional[int]:
+    """
+    Reads a tenure as whole months: a Dialogflow @sys.duration object
+    ({"amount": 5, "unit": "yr"}), text such as "5 years" or "60 months", or a
+    bare number (years up to BARE_TENURE_MAX_YEARS, months above). Returns
+    None when no tenure was given, and raises ValueError for one that was
+    given but cannot be used: an unknown unit (e.g. days), text that is not a
+    tenure, or a tenure outside 1 to `max_months` months.
+    """
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value, unit = value.get("amount"), str(value.get("unit") or "").lower()
+        if value is None or value == "":
+            return None
+        amount = parse_number(value)
+    elif isinstance(value, str):
+        if not value.strip():
+            return None
+        match = _TENURE.fullmatch(value.strip().lower())
+        if match is None:
+            raise ValueError(f"{value!r} is not a tenure")
+        amount, unit = float(match.group("number")), match.group("unit") or ""
+    elif value is None:
+        return None
+    else:
+        amount, unit = parse_number(value), ""
+    if amount is None or amount <= 0:
+        raise ValueError("tenure must be a positive number")
+    if unit:
+        factor = TENURE_UNITS.get(unit)
+        if factor is None:
+            raise ValueError(f"tenure unit {unit!r} is not months or years")
+    else:
+        factor = 12 if amount <= BARE_TENURE_MAX_YEARS else 1
+    months = amount * factor
+    if not 1 <= months <= max_months:  # also catches inf from huge amounts
+        raise ValueError(f"tenure must be from 1 to {max_months} months")
+    return round(months)
+
+
+def format_rupees(amount: float) -> str:
+    """
+    Rounds to whole rupees with Indian digit grouping: 1000000 -> "₹10,00,000".
+    """
+    digits = str(round(amount))
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return "₹" + ",".join(groups + [tail])
+
+
+def format_tenure(months: int) -> str:
+    years, remainder = divmod(months, 12)
+    if not remainder:
+        return f"{years} year{'s' if years != 1 else ''}"
+    return f"{months} months"
+
+
+def quote_text(loan_type: str, principal: float, annual_rate: float, months: int) -> str:
+    """
+    The chat reply for one quote.
+    """
+    emi = monthly_instalment(principal, annual_rate, months)
+    total_interest = emi * months - principal
+    return (
+        f"For a {loan_type} loan of {format_rupees(principal)} at {annual_rate:g}% a year over "
+        f"{format_tenure(months)}, your EMI would be {format_rupees(emi)} a month, "
+        f"with {format_rupees(total_interest)} paid in interest in total."
+    )
+
+
+# --- Tables (NumPy) ---
+class QuoteTable(NamedTuple):
+    # One entry per combination, all the same length
+    principal: "np.ndarray"
+    annual_rate: "np.ndarray"
+    tenure_months: "np.ndarray"
+    emi: "np.ndarray"
+    total_payment: "np.ndarray"
+    total_interest: "np.ndarray"
+
+
+class Schedule(NamedTuple):
+    # One entry per month
+    month: "np.ndarray"
+    payment: "np.ndarray"
+    principal: "np.ndarray"
+    interest: "np.ndarray"
+    balance: "np.ndarray"
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("EMI tables and schedules need NumPy installed")
+
+
+def instalments(principal: Any, annual_rate: Any, months: Any) -> "np.ndarray":
+    """
+    EMIs for broadcastable arrays of principals, annual rates (percent) and
+    tenures in months.
+    """
+    _require_numpy()
+    principal, rate, months = np.broadcast_arrays(
+        np.asarray(principal, dtype=float), np.asarray(annual_rate, dtype=float) / 1200, np.asarray(months, dtype=float),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amortizing = principal * rate / -np.expm1(-months * np.log1p(rate))
+    return np.where(rate == 0, principal / months, amortizing)
+
+
+def _check_columns(principal: "np.ndarray", annual_rate: "np.ndarray", months: "np.ndarray") -> None:
+    # The same limits as _check_terms, checked on whole columns
+    if not np.all(np.isfinite(principal) & (principal > 0)):
+        raise ValueError("principal must be a positive amount")
+    if not np.all(np.isfinite(annual_rate) & (annual_rate >= 0) & (annual_rate <= MAX_ANNUAL_RATE)):
+        raise ValueError(f"annual_rate must be a percentage between 0 and {MAX_ANNUAL_RATE:g}")
+    if not np.all((months == np.floor(months)) & (months >= 1) & (months <= MAX_TENURE_MONTHS)):
+        raise ValueError(f"tenure_months must be a whole number of months from 1 to {MAX_TENURE_MONTHS}")
+
+
+def quote_grid(principals: Sequence[float], annual_rates: Sequence[float], tenures: Sequence[int]) -> QuoteTable:
+    """
+    Quotes every combination of the given principals, annual rates and
+    tenures, ordered by principal, then rate, then tenure. Raises ValueError
+    for terms that cannot be quoted.
+    """
+    _require_numpy()
+    columns = [np.asarray(values, dtype=float).ravel() for values in (principals, annual_rates, tenures)]
+    if any(not len(column) for column in columns):
+        raise ValueError("principal, annual_rate and tenure_months each need at least one value")
+    principal, annual_rate, months = (grid.ravel() for grid in np.meshgrid(*columns, indexing="ij"))
+    return _quote(principal, annual_rate, months)
+
+
+def quote_by_tenure(principals: Sequence[float], tenures: Sequence[int], annual_rate: Callable[[int], float]) -> QuoteTable:
+    """
+    Quotes every combination of the given principals and tenures, ordered by
+    principal, then tenure, each tenure at the rate `annual_rate(tenure)`
+    gives (e.g. from the rate catalog), looked up once per tenure.
+    """
+    _require_numpy()
+    principal = np.asarray(principals, dtype=float).ravel()
+    tenure = np.asarray(tenures, dtype=float).ravel()
+    if not len(principal) or not len(tenure):
+        raise ValueError("principal and tenure_months each need at least one value")
+    rates = np.asarray([annual_rate(months) for months in tenure.tolist()], dtype=float)
+    principal, position = (grid.ravel() for grid in np.meshgrid(principal, np.arange(len(tenure)), indexing="ij"))
+    return _quote(principal, rates[position], tenure[position])
+
+
+def _quote(principal: "np.ndarray", annual_rate: "np.ndarray", months: "np.ndarray") -> QuoteTable:
+    _check_columns(principal, annual_rate, months)
+    emi = instalments(principal, annual_rate, months)
+    total_payment = emi * months
+    return QuoteTable(principal, annual_rate, months.astype(int), emi, total_payment, total_payment - principal)
+
+
+def amortization_schedule(principal: float, annual_rate: float, months: int) -> Schedule:
+    """
+    The month-by-month split of each EMI into interest and principal, and the
+    balance left after it. Balances come from the closed form rather than a
+    running subtraction, so rounding never accumulates.
+    """
+    _require_numpy()
+    _check_terms(principal, annual_rate, months)
+    rate = annual_rate / 1200
+    emi = float(instalments(principal, annual_rate, months))
+    month = np.arange(1, int(months) + 1)
+    if rate == 0:
+        balance = principal - emi * month
+    else:
+        grown = np.expm1(month * math.log1p(rate))  # (1 + r)^k - 1
+        balance = principal * (grown + 1) - emi * grown / rate
+    balance[-1] = 0.0
+    np.maximum(balance, 0.0, out=balance)
+    opening = np.concatenate(([principal], balance[:-1]))
+    interest = opening * rate
+    payment = np.full(len(month), emi)
+    # The last payment clears whatever is left
+    payment[-1] = opening[-1] + interest[-1]
+    return Schedule(month, payment, payment - interest, interest, balance)
+
+
+def rows(columns: NamedTuple) -> List[Dict[str, Any]]:
+    """
+    A QuoteTable or Schedule as JSON-ready rows, amounts rounded to paise.
+    """
+    names = columns._fields
+    values = [
+        column.tolist() if column.dtype.kind in "iu" else np.round(column, 2).tolist()
+        for column in columns
+    ]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
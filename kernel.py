@@ -0,0 +1,173 @@
+# kernel.py
+# NumPy eligibility kernel for columnar applicant data.
+# The thresholds are read from the same product table the webhook compiles
+# (see rules.py), so scoring a lead database in bulk and answering a chat
+# request can never disagree.
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from qualification import classify_text, parse_level
+from rules import (
+    ELIGIBLE, FIELDS, INCOMPLETE, INELIGIBLE, UNKNOWN,
+    Decision, RuleSet,
+)
+
+# --- Outcome codes ---
+OUTCOME_UNKNOWN = 0
+OUTCOME_INCOMPLETE = 1
+OUTCOME_INELIGIBLE = 2
+OUTCOME_ELIGIBLE = 3
+OUTCOMES = (UNKNOWN, INCOMPLETE, INELIGIBLE, ELIGIBLE)  # indexed by outcome code
+
+# --- Reason codes (bit flags, combined with |) ---
+REASON_UNKNOWN_LOAN_TYPE = 1
+REASON_MISSING_AGE = 2
+REASON_MISSING_INCOME = 4
+REASON_MISSING_QUALIFICATION = 8
+REASON_AGE_BELOW_MIN = 16
+REASON_AGE_ABOVE_MAX = 32
+REASON_INCOME_BELOW_MIN = 64
+REASON_QUALIFICATION_NOT_MET = 128
+
+# Loan type code for anything that is not a known product
+UNKNOWN_LOAN_CODE = -1
+
+
+class EligibilityKernel:
+    """
+    Evaluates whole columns at once. Every per-product threshold is laid out in
+    a small lookup table indexed by loan type code, so a batch is a handful of
+    gathers and comparisons regardless of how many products exist.
+    """
+
+    def __init__(self, rules: RuleSet):
+        self.rules = rules
+        self.loan_types: Tuple[str, ...] = tuple(rules.products)
+        self.loan_codes: Dict[str, int] = {loan_type: code for code, loan_type in enumerate(self.loan_types)}
+
+        # One row per product plus a trailing row for unknown loan types
+        rows = len(self.loan_types) + 1
+        self._min_age = np.full(rows, -np.inf)
+        self._max_age = np.full(rows, np.inf)
+        self._min_income = np.full(rows, -np.inf)
+        self._requires = np.zeros((len(FIELDS), rows), dtype=bool)
+        self._has_min_level = np.zeros(rows, dtype=bool)
+        self._min_level = np.zeros(rows, dtype=np.int8)
+        self._known = np.ones(rows, dtype=bool)
+        self._known[-1] = False
+
+        for code, loan_type in enumerate(self.loan_types):
+            spec = rules.products[loan_type]
+            if spec.get("min_age") is not None:
+                self._min_age[code] = spec["min_age"]
+            if spec.get("max_age") is not None:
+                self._max_age[code] = spec["max_age"]
+            if spec.get("min_income") is not None:
+                self._min_income[code] = spec["min_income"]
+            for field in spec["required"]:
+                self._requires[FIELDS.index(field), code] = True
+            if spec.get("qualification") is not None:
+                self._has_min_level[code] = True
+                self._min_level[code] = parse_level(spec["qualification"])
+
+        # Prebuilt decisions, so mapping codes back to replies is a single gather
+        self._decisions = np.empty((rows, len(OUTCOMES)), dtype=object)
+        for code in range(rows):
+            for outcome_code, outcome in enumerate(OUTCOMES):
+                if code == rows - 1 or outcome == UNKNOWN:
+                    self._decisions[code, outcome_code] = rules.unknown
+                else:
+                    loan_type = self.loan_types[code]
+                    text = rules.products[loan_type]["responses"][outcome]
+                    self._decisions[code, outcome_code] = Decision(loan_type, outcome, text, rules.version)
+
+    # --- Column encoding ---
+    def encode_loan_types(self, loan_types: Sequence[Optional[str]]) -> np.ndarray:
+        """
+        Maps loan type names to codes; None, non-strings and unknown names become UNKNOWN_LOAN_CODE.
+        """
+        values = np.asarray([value if isinstance(value, str) else "" for value in loan_types], dtype=str)
+        uniques, inverse = np.unique(values, return_inverse=True)
+        lookup = np.array([self.loan_codes.get(value, UNKNOWN_LOAN_CODE) for value in uniques], dtype=np.int64)
+        return lookup[inverse] if len(values) else np.empty(0, dtype=np.int64)
+
+    def qualification_flags(self, loan_codes: np.ndarray, qualifications: Sequence[str]) -> np.ndarray:
+        """
+        Returns 1 where the qualification meets the product's minimum education
+        level, 0 where it does not and -1 where it is missing ('' or None).
+        Each distinct text is classified once.
+        """
+        text = np.asarray(["" if value is None else str(value) for value in qualifications], dtype=str)
+        if not len(text):
+            return np.empty(0, dtype=np.int8)
+        uniques, inverse = np.unique(text, return_inverse=True)
+        levels = np.array([classify_text(value) for value in uniques], dtype=np.int8)[inverse]
+        rows = np.where(loan_codes < 0, len(self.loan_types), loan_codes)
+        return np.where(text == "", -1, levels >= self._min_level[rows]).astype(np.int8)
+
+    # --- Kernel ---
+    def evaluate(
+        self,
+        loan_codes: np.ndarray,
+        age: np.ndarray,
+        income: np.ndarray,
+        qualified: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scores every row. Missing ages and incomes are NaN, `qualified` uses the
+        flags from qualification_flags. Returns (outcome codes, reason bits).
+        Ages and incomes are truncated like int() in the webhook.
+        """
+        rows = np.where(loan_codes < 0, len(self.loan_types), loan_codes)
+        age = np.trunc(np.asarray(age, dtype=np.float64))
+        income = np.trunc(np.asarray(income, dtype=np.float64))
+        qualified = np.asarray(qualified)
+
+        known = self._known[rows]
+        reasons = np.where(known, 0, REASON_UNKNOWN_LOAN_TYPE).astype(np.uint8)
+
+        missing = np.zeros(len(rows), dtype=bool)
+        for field, value_missing, reason in (
+            ("age", np.isnan(age), REASON_MISSING_AGE),
+            ("income", np.isnan(income), REASON_MISSING_INCOME),
+            ("qualification", qualified < 0, REASON_MISSING_QUALIFICATION),
+        ):
+            field_missing = self._requires[FIELDS.index(field)][rows] & value_missing
+            reasons[field_missing] |= reason
+            missing |= field_missing
+
+        checked = known & ~missing
+        failed = np.zeros(len(rows), dtype=bool)
+        for fails, reason in (
+            (age < self._min_age[rows], REASON_AGE_BELOW_MIN),
+            (age > self._max_age[rows], REASON_AGE_ABOVE_MAX),
+            (income < self._min_income[rows], REASON_INCOME_BELOW_MIN),
+            (self._has_min_level[rows] & (qualified == 0), REASON_QUALIFICATION_NOT_MET),
+        ):
+            fails &= checked
+            reasons[fails] |= reason
+            failed |= fails
+
+        outcomes = np.full(len(rows), OUTCOME_UNKNOWN, dtype=np.uint8)
+        outcomes[known & missing] = OUTCOME_INCOMPLETE
+        outcomes[checked & failed] = OUTCOME_INELIGIBLE
+        outcomes[checked & ~failed] = OUTCOME_ELIGIBLE
+        return outcomes, reasons
+
+    def decisions(
+        self,
+        loan_types: Sequence[Optional[str]],
+        age: Sequence[float],
+        income: Sequence[float],
+        qualifications: Sequence[Any],
+    ) -> List[Decision]:
+        """
+        Convenience wrapper returning the same Decision objects RuleSet.evaluate
+        would, for callers that start from row-shaped data.
+        """
+        loan_codes = self.encode_loan_types(loan_types)
+        qualified = self.qualification_flags(loan_codes, qualifications)
+        outcomes, _ = self.evaluate(loan_codes, np.asarray(age, dtype=np.float64), np.asarray(income, dtype=np.float64), qualified)
+        rows = np.where(loan_codes < 0, len(self.loan_types), loan_codes)
+        return self._decisions[rows, outcomes].tolist()
@@ -0,0 +1,376 @@
+# loadgen.py
+# Local capacity testing: synthesizes Dialogflow ES conversations and drives
+# /webhook with them at a target rate, reporting throughput and latency
+# percentiles. Works entirely offline against a server on localhost.
+#
+#   uvicorn main:app --workers 4 &
+#   python loadgen.py --rate 500 --concurrency 64 --duration 30
+#   python loadgen.py --rate 0 -c 32 -o run.json      # as fast as the server answers
+#   python loadgen.py --dump conversations.jsonl      # write the bodies for replay.py
+#
+# Each virtual user plays one conversation at a time, turn by turn, waiting for
+# every reply before sending the next turn (a closed loop). With --rate the
+# users share one send schedule, and latency is measured from the time a
+# request was scheduled rather than when it was sent, so a server that falls
+# behind shows up in the percentiles instead of silently lowering the rate.
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple
+
+from loan_types import LOAN_TYPE_ALIASES, LOAN_TYPE_PARAMETER
+from rules import LOAN_PRODUCTS
+
+DEFAULT_URL = "http://127.0.0.1:8000/webhook"
+
+# The context the bot's first intent sets; see LOAN_DETAILS_CONTEXT in main.py
+LOAN_DETAILS_CONTEXT = "awaiting-loan-details"
+PROJECT = "projects/loan-bot/agent"
+
+# Stands in for the session ID in pre-encoded bodies, so a conversation can be
+# replayed under a fresh session without encoding it again
+SESSION_PLACEHOLDER = "__loadgen_session__"
+
+
+# --- Latency histogram ---
+class LatencyHistogram:
+    """
+    An HDR-style histogram of microsecond latencies: exact below
+    2**`precision_bits` µs and within 1/2**(`precision_bits` - 1) relative
+    error above it (0.1% with the default 11 bits), at a fixed cost per
+    recorded value however wide the range.
+    """
+
+    def __init__(self, precision_bits: int = 11):
+        self._bits = precision_bits
+        self._half = 1 << (precision_bits - 1)
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        shift = max(0, value.bit_length() - self._bits)
+        return (shift * self._half) + (value >> shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        # The largest value that lands in the same bucket, as HdrHistogram reports
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        return ((index - shift * self._half + 1) << shift) - 1
+
+    def record(self, microseconds: int) -> None:
+        value = max(0, int(microseconds))
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, hits in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + hits
+        if other.count:
+            self.min = other.min if not self.count else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, percent: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * percent // 100))  # rank of the value, rounded up
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+# --- Conversation simulator ---
+class Simulator:
+    """
+    Synthesizes multi-turn conversations shaped like Dialogflow ES webhook
+    bodies. A conversation opens with a loan type (an intent flag or a
+    loan-type entity, often a synonym), then supplies the product's required
+    fields one turn at a time, as typed entities, @sys.number fallbacks or free
+    text, sometimes leaving a turn without the field asked for. The loan
+    details context carries everything collected so far, and unrelated
+    contexts accumulate as the conversation goes on.
+    """
+
+    def __init__(self, seed: Optional[int] = None, missing_rate: float = 0.15, max_extra_contexts: int = 8):
+        self.random = random.Random(seed)
+        self.missing_rate = missing_rate
+        self.max_extra_contexts = max_extra_contexts
+        self.loan_types = [loan_type for loan_type, _ in LOAN_TYPE_ALIASES if loan_type in LOAN_PRODUCTS]
+        self.aliases = dict(LOAN_TYPE_ALIASES)
+
+    # Each field generator returns (parameters for the turn, what the user typed)
+    def _age(self) -> Tuple[Dict[str, Any], str]:
+        age = self.random.randint(17, 65)
+        style = self.random.random()
+        if style < 0.5:
+            return {"age": age}, f"I am {age}"
+        if style < 0.8:
+            return {"number": [age]}, str(age)  # matched by @sys.number only
+        return {"age": f"{age} years"}, f"{age} years"
+
+    def _income(self) -> Tuple[Dict[str, Any], str]:
+        income = self.random.choice((15, 22, 28, 35, 45, 60, 90)) * 1000 + self.random.randrange(0, 1000, 100)
+        style = self.random.random()
+        if style < 0.4:
+            return {"income": {"amount": income, "currency": "INR"}}, f"{income} rupees"
+        if style < 0.7:
+            return {"number": [income]}, str(income)
+        text = self.random.choice((f"{income // 1000}k", f"{income:,}", f"₹{income}"))
+        return {"income": text}, text
+
+    def _qualification(self) -> Tuple[Dict[str, Any], str]:
+        text = self.random.choice((
+            "graduate", "post graduate", "under graduate", "B.Tech", "MBA", "12th pass", "diploma",
+            "not a graduate", "B.Com dropout",
+        ))
+        return {"qualification": text}, text
+
+    def _opening(self, loan_type: str) -> Tuple[Dict[str, Any], str, str]:
+        entry = self.aliases[loan_type]
+        if entry.get("flags") and self.random.random() < 0.5:
+            return {self.random.choice(entry["flags"]): True}, f"Am I eligible for a {loan_type} loan?", f"{loan_type.title()} Eligibility"
+        name = self.random.choice((loan_type,) + tuple(entry.get("names", ())))
+        return {LOAN_TYPE_PARAMETER: name}, f"I want a {name} loan", "Loan Eligibility"
+
+    def _context(self, session: str, name: str, lifespan: int, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        return {"name": f"{session}/contexts/{name}", "lifespanCount": lifespan, "parameters": parameters}
+
+    def _body(
+        self, session: str, turn: int, text: str, intent: str, parameters: Dict[str, Any], remembered: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        contexts = [self._context(session, LOAN_DETAILS_CONTEXT, 5, dict(remembered))]
+        contexts.append(self._context(session, "__system_counters__", 1, {"no-input": 0, "no-match": 0}))
+        contexts.extend(
+            self._context(session, f"loan-followup-{index}", 2, {"turn": index})
+            for index in range(min(turn, self.max_extra_contexts))
+        )
+        return {
+            "responseId": f"{self.random.getrandbits(64):016x}-{turn:08x}",
+            "session": session,
+            "queryResult": {
+                "queryText": text,
+                "parameters": parameters,
+                "allRequiredParamsPresent": True,
+                "fulfillmentText": "",
+                "fulfillmentMessages": [{"text": {"text": [""]}}],
+                "outputContexts": contexts,
+                "intent": {"name": f"{PROJECT}/intents/{self.random.getrandbits(64):016x}", "displayName": intent},
+                "intentDetectionConfidence": round(self.random.uniform(0.6, 1.0), 2),
+                "languageCode": "en",
+            },
+            "originalDetectIntentRequest": {"source": "DIALOGFLOW_CONSOLE", "payload": {}},
+        }
+
+    def conversation(self, session: str = SESSION_PLACEHOLDER) -> List[Dict[str, Any]]:
+        """
+        One conversation's webhook bodies, in turn order.
+        """
+        loan_type = self.random.choice(self.loan_types)
+        parameters, text, intent = self._opening(loan_type)
+        remembered = dict(parameters)
+        bodies = [self._body(session, 0, text, intent, parameters, remembered)]
+        generators = {"age": self._age, "income": self._income, "qualification": self._qualification}
+        for field in LOAN_PRODUCTS[loan_type]["required"]:
+            while True:
+                turn = len(bodies)
+                if self.random.random() < self.missing_rate:
+                    # The user answered something else; the field arrives empty
+                    parameters, text = {field: ""}, "I'm not sure"
+                else:
+                    parameters, text = generators[field]()
+                remembered.update(
+                    (name, value) for name, value in parameters.items() if value != ""
+                )
+                bodies.append(self._body(session, turn, text, "Loan Details", parameters, remembered))
+                if parameters.get(field) != "":
+                    break
+        return bodies
+
+    def encoded_conversations(self, size: int) -> List[List[bytes]]:
+        return [
+            [json.dumps(body, ensure_ascii=False).encode("utf-8") for body in self.conversation()]
+            for _ in range(size)
+        ]
+
+
+# --- Load driver ---
+class Results:
+    def __init__(self):
+        self.latency = LatencyHistogram()   # from the scheduled send time
+        self.service = LatencyHistogram()   # from the actual send time
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.shed: Counter = Counter()
+        self.conversations = 0
+
+    def report(self, elapsed: float, target_rate: float) -> Dict[str, Any]:
+        def percentiles(histogram: LatencyHistogram) -> Dict[str, float]:
+            summary = {f"p{percent:g}": histogram.percentile(percent) / 1000 for percent in (50, 90, 99, 99.9)}
+            summary.update(mean=round(histogram.mean() / 1000, 3), max=histogram.max / 1000)
+            return summary
+
+        requests = self.latency.count
+        return {
+            "duration_seconds": round(elapsed, 3),
+            "target_rate": target_rate or None,
+            "requests": requests,
+            "throughput": round(requests / elapsed, 1) if elapsed else 0.0,
+            "conversations": self.conversations,
+            "statuses": dict(sorted(self.statuses.items())),
+            "errors": dict(self.errors),
+            "shed": dict(self.shed),
+            "latency_ms": percentiles(self.latency),
+            "service_time_ms": percentiles(self.service),
+        }
+
+
+async def run_load(
+    url: str,
+    conversations: List[List[bytes]],
+    rate: float = 0.0,
+    concurrency: int = 32,
+    duration: float = 30.0,
+    warmup: float = 2.0,
+    timeout: float = 10.0,
+) -> Dict[str, Any]:
+    """
+    Drives `url` with `concurrency` virtual users for `warmup` + `duration`
+    seconds and returns the report for the measured part. `rate` is the
+    target requests per second across all users; 0 sends as fast as replies
+    come back.
+    """
+    import httpx
+
+    results = Results()
+    slots = count()
+    sessions = count()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+    interval = 1.0 / rate if rate > 0 else 0.0
+    headers = {"content-type": "application/json"}
+    placeholder = SESSION_PLACEHOLDER.encode()
+
+    async def user(client: "httpx.AsyncClient", first: int) -> None:
+        position = first
+        while True:
+            bodies = conversations[position % len(conversations)]
+            position += concurrency
+            session = f"{PROJECT}/sessions/loadgen-{next(sessions)}".encode()
+            for body in bodies:
+                if interval:
+                    scheduled = started + next(slots) * interval
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                sent = time.perf_counter()
+                if not interval:
+                    scheduled = sent
+                if sent >= stop_at:
+                    return
+                measured = scheduled >= measure_from
+                try:
+                    response = await client.post(url, content=body.replace(placeholder, session), headers=headers)
+                except httpx.HTTPError as exc:
+                    if measured:
+                        results.errors[type(exc).__name__] += 1
+                    break  # abandon the conversation, as Dialogflow would
+                finished = time.perf_counter()
+                if measured:
+                    results.latency.record((finished - scheduled) * 1e6)
+                    results.service.record((finished - sent) * 1e6)
+                    results.statuses[response.status_code] += 1
+                    reason = response.headers.get("x-load-shed")
+                    if reason:
+                        results.shed[reason] += 1
+            else:
+                if time.perf_counter() >= measure_from:
+                    results.conversations += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        await asyncio.gather(*(user(client, index) for index in range(concurrency)))
+    elapsed = min(time.perf_counter(), stop_at) - measure_from
+    return results.report(elapsed, rate)
+
+
+def print_report(report: Dict[str, Any], stream=sys.stdout) -> None:
+    target = f" (target {report['target_rate']:g}/s)" if report["target_rate"] else ""
+    print(f"{report['requests']} requests in {report['duration_seconds']:.1f}s: {report['throughput']:.1f} req/s{target}", file=stream)
+    print(f"{report['conversations']} conversations completed; status codes {report['statuses']}", file=stream)
+    if report["errors"]:
+        print(f"errors: {report['errors']}", file=stream)
+    if report["shed"]:
+        print(f"load shed: {report['shed']}", file=stream)
+    print(f"{'latency (ms)':<16}" + "".join(f"{name:>10}" for name in report["latency_ms"]), file=stream)
+    for label, key in (("scheduled", "latency_ms"), ("service time", "service_time_ms")):
+        print(f"{label:<16}" + "".join(f"{value:>10.3f}" for value in report[key].values()), file=stream)
+
+
+def dump_conversations(simulator: Simulator, size: int, path: str) -> None:
+    """
+    Writes `size` conversations as JSONL webhook bodies, one turn per line,
+    each under its own session; the file can be fed to replay.py.
+    """
+    with open(path, "w", encoding="utf-8") as stream:
+        for number in range(size):
+            for body in simulator.conversation(f"{PROJECT}/sessions/loadgen-{number}"):
+                stream.write(json.dumps(body, ensure_ascii=False) + "\n")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Drive /webhook with simulated Dialogflow conversations.")
+    parser.add_argument("--url", default=DEFAULT_URL, help=f"webhook URL (default: {DEFAULT_URL})")
+    parser.add_argument("-r", "--rate", type=float, default=0.0, help="target requests per second; 0 means as fast as possible")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="virtual users, each with one keep-alive connection")
+    parser.add_argument("-d", "--duration", type=float, default=30.0, help="seconds to measure")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds to run before measuring")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    parser.add_argument("--conversations", type=int, default=1000, help="distinct conversations to synthesize up front")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for a repeatable mix of conversations")
+    parser.add_argument("-o", "--output", help="also write the report as JSON to this file")
+    parser.add_argument("--dump", metavar="PATH", help="write the conversations as JSONL webhook bodies and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    simulator = Simulator(args.seed)
+    if args.dump:
+        dump_conversations(simulator, args.conversations, args.dump)
+        return 0
+    conversations = simulator.encoded_conversations(args.conversations)
+    report = asyncio.run(run_load(
+        args.url, conversations, args.rate, args.concurrency, args.duration, args.warmup, args.timeout,
+    ))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            json.dump(report, stream, indent=2)
+    return 0 if report["requests"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# loan_types.py
+# Works out which loan a user is asking about. The ways a loan type can be
+# expressed (flag parameters set by intents, and names or synonyms in the
+# loan-type parameter) are declared in one table and compiled into frozen
+# lookups, so a request costs the same however many aliases there are.
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Tuple
+
+# The entity parameter carrying the loan type; it wins over any flag parameter
+LOAN_TYPE_PARAMETER = "loan-type"
+
+# In priority order: when several flag parameters are set, the first wins.
+# "flags" are intent parameters that mean "this loan type" when truthy;
+# "names" are values of the loan-type parameter, matched case-insensitively.
+LOAN_TYPE_ALIASES: Tuple[Tuple[str, Dict[str, Tuple[str, ...]]], ...] = (
+    ("home", {
+        "flags": ("Home_eligibility",),
+        "names": ("home", "home loan", "house", "housing", "housing loan", "ghar", "makaan", "makan", "griha", "घर", "मकान", "गृह"),
+    }),
+    ("car", {
+        "flags": ("Car_eligibility",),
+        "names": ("car", "car loan", "vehicle", "vehicle loan", "auto", "auto loan", "vahan", "vaahan", "gaadi", "gadi", "वाहन", "गाड़ी", "कार"),
+    }),
+    ("education", {
+        "flags": ("education_eligibility", "edu_eligibility"),
+        "names": ("education", "education loan", "edu", "student", "student loan", "study", "shiksha", "vidya", "शिक्षा", "विद्या"),
+    }),
+    ("personal", {
+        "flags": ("personal_eligibility",),
+        "names": ("personal", "personal loan", "vyaktigat", "व्यक्तिगत", "निजी"),
+    }),
+    ("business", {
+        "flags": ("Business_eligibility",),
+        "names": ("business", "business loan", "vyapar", "vyapaar", "vyavsay", "व्यापार", "व्यवसाय"),
+    }),
+)
+
+
+def _spellings(name: str) -> Iterable[str]:
+    # The common spellings, so most values match without being normalized first
+    return dict.fromkeys((name, name.lower(), name.upper(), name.capitalize(), name.title()))
+
+
+class LoanTypeResolver:
+    """
+    Resolves merged Dialogflow parameters to a loan type: the loan-type
+    parameter when set (normalized through the name table; unrecognized
+    values are returned as they are), otherwise the highest-priority flag
+    parameter that is set.
+    """
+
+    def __init__(self, flags: Mapping[str, Tuple[int, str]], names: Mapping[str, str]):
+        # flag parameter -> (priority, loan type); name -> loan type
+        self.flags = flags
+        self.names = names
+        self._flag_names = frozenset(flags)
+        # Plain dict copies for the hot path; the proxies above are read-only views
+        self._flags = dict(flags)
+        self._names = dict(names)
+
+    def normalize(self, value: Any) -> Any:
+        if not isinstance(value, str):
+            return value
+        loan_type = self._names.get(value)
+        if loan_type is None:
+            loan_type = self._names.get(value.strip().casefold(), value)
+        return loan_type
+
+    def resolve(self, params: Dict[str, Any]) -> Any:
+        value = params.get(LOAN_TYPE_PARAMETER)
+        if value:
+            return self.normalize(value)
+        # Both set operations walk the request's keys once, in C; the first
+        # allocates nothing, which keeps the common no-flag case cheap
+        if self._flag_names.isdisjoint(params):
+            return None
+        best_priority = len(self._flags)
+        best = None
+        for name in self._flag_names.intersection(params):
+            priority, loan_type = self._flags[name]
+            if priority < best_priority and params[name]:
+                best_priority, best = priority, loan_type
+        return best
+
+
+def compile_resolver(aliases: Iterable[Tuple[str, Dict[str, Tuple[str, ...]]]] = LOAN_TYPE_ALIASES) -> LoanTypeResolver:
+    """
+    Compiles an alias table into a LoanTypeResolver. Where two entries claim
+    the same flag or name, the earlier one keeps it.
+    """
+    flags: Dict[str, Tuple[int, str]] = {}
+    names: Dict[str, str] = {}
+    for priority, (loan_type, entry) in enumerate(aliases):
+        for flag in entry.get("flags", ()):
+            flags.setdefault(flag, (priority, loan_type))
+        for name in (loan_type,) + tuple(entry.get("names", ())):
+            for spelling in _spellings(name.strip()):
+                names.setdefault(spelling, loan_type)
+            names.setdefault(name.strip().casefold(), loan_type)
+    return LoanTypeResolver(MappingProxyType(flags), MappingProxyType(names))
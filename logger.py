@@ -0,0 +1,174 @@
+# logger.py
+# A small structured logger that keeps formatting and I/O off the request path.
+# Records are pushed onto a bounded in-memory queue and a background thread
+# serialises them as JSON lines and writes them to the stream in batches.
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS_BY_NAME = {name: level for level, name in LEVEL_NAMES.items()}
+
+Record = Tuple[float, int, str, Dict[str, Any]]
+
+
+class AsyncLogger:
+    """
+    Level-gated, sampled JSON-lines logger.
+    Calls below the configured level return before touching their arguments,
+    and when the queue is full records are dropped (and counted) instead of
+    making the caller wait for the writer. A record that cannot be serialised
+    is counted in `failed` and skipped; the rest of its batch is still written.
+    """
+
+    def __init__(
+        self,
+        level: int = INFO,
+        sample_rate: float = 1.0,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        stream: Optional[TextIO] = None,
+    ):
+        self.level = level
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.stream = stream
+        self.dropped = 0
+        self.failed = 0
+        self._queue: "queue.Queue[Record]" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        # Guards starting the writer and the counters, which several threads update
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            # A lock another thread held at fork time would stay held in the child
+            os.register_at_fork(after_in_child=self._reset_lock)
+        atexit.register(self.flush)
+
+    def is_enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def sample(self) -> bool:
+        """
+        Decides once per request whether its records are kept, so a sampled
+        request is logged completely and an unsampled one costs nothing.
+        """
+        if self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+    def log(self, level: int, event: str, **fields: Any) -> None:
+        if level < self.level:
+            return
+        if self._writer_pid != os.getpid():
+            # Threads do not survive a fork, so each worker starts its own writer
+            with self._lock:
+                if self._writer_pid != os.getpid():
+                    self._start_writer()
+        # Callers may keep changing a dict or list after logging it, so copy
+        # them now rather than let the writer read them mid-update
+        fields = {key: _snapshot(value) for key, value in fields.items()}
+        try:
+            self._queue.put_nowait((time.time(), level, event, fields))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def debug(self, event: str, **fields: Any) -> None:
+        if DEBUG >= self.level:
+            self.log(DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any) -> None:
+        if INFO >= self.level:
+            self.log(INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self.log(WARNING, event, **fields)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self.log(ERROR, event, **fields)
+
+    def flush(self) -> None:
+        """
+        Writes out everything still queued. Called at interpreter exit.
+        """
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    # --- Background writer ---
+    def _reset_lock(self) -> None:
+        self._lock = threading.Lock()
+
+    def _start_writer(self) -> None:
+        self._writer_pid = os.getpid()
+        self._writer = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._writer.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: list) -> None:
+        lines = []
+        failed = 0
+        for timestamp, level, event, fields in batch:
+            record = {"ts": round(timestamp, 6), "level": LEVEL_NAMES.get(level, str(level)), "event": event}
+            record.update(fields)
+            try:
+                lines.append(json.dumps(record, default=str, ensure_ascii=False))
+            except (TypeError, ValueError, RecursionError, RuntimeError):
+                # e.g. non-string keys or a circular reference
+                failed += 1
+        if failed:
+            with self._lock:
+                self.failed += failed
+        if not lines:
+            return
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except (OSError, ValueError):  # Closed or broken stream, e.g. during shutdown
+            pass
+
+
+def _snapshot(value: Any) -> Any:
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def get_logger() -> AsyncLogger:
+    """
+    Builds a logger from LOG_LEVEL, LOG_SAMPLE_RATE and LOG_QUEUE_SIZE.
+    """
+    return AsyncLogger(
+        level=LEVELS_BY_NAME.get(os.getenv("LOG_LEVEL", "INFO").upper(), INFO),
+        sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+        max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    )
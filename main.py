@@ -1,9 +1,34 @@
 # main.py
 # Import necessary libraries
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
-import time # Import time to measure execution duration
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Optional, Dict, Any, List, Union
+from contextlib import asynccontextmanager
+from functools import partial
+import math
+import os
+import time # perf_counter_ns() times each stage of the webhook
+
+from admission import AdmissionController, AdmissionMiddleware
+from batch import NDJSON_MEDIA_TYPE, is_ndjson, iter_ndjson, parse_json_array, stream_results
+from contexts import ContextSelector
+from affordability import AffordabilityCache
+from audit import get_audit_log
+from decision_cache import DecisionCache
+from decoding import DecodedQueryResult, DecodedRequest, fast_decode
+from emi import MAX_TENURE_MONTHS, amortization_schedule, parse_tenure_months, quote_by_tenure, quote_grid, quote_text, rows as emi_rows
+from loan_types import compile_resolver
+from logger import get_logger
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from numeric import parse_number
+from rate_catalog import RateStore
+from rate_limit import RateLimiter
+from responses import CONTENT_TYPE as RESPONSE_CONTENT_TYPE, render_body
+from rule_store import RuleSnapshot, RuleStore
+from rules import ELIGIBLE, Decision
+from session_store import SessionStore, SqliteSessionStore
 
 # --- Pydantic Models for Data Validation ---
 # We need to define the structure for contexts to properly parse them.
@@ -17,30 +42,300 @@ class QueryResult(BaseModel):
     intent: Dict
     # Define the output_contexts field to capture the conversation's memory
     output_contexts: Optional[List[Context]] = Field([], alias='outputContexts')
+    # The user's language, used to pick a localized reply
+    language_code: Optional[str] = Field(None, alias='languageCode')
 
 class WebhookRequest(BaseModel):
+    # e.g. projects/<project>/agent/sessions/<session-id>; identifies the conversation
+    session: Optional[str] = None
     query_result: QueryResult = Field(..., alias='queryResult')
 
 # --- Create the FastAPI Application ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker, after any fork, so each one watches the rule and rate files
+    RULE_STORE.start()
+    RATES.start()
+    try:
+        yield
+    finally:
+        RULE_STORE.stop()
+        RATES.stop()
+        if AUDIT is not None:
+            AUDIT.flush()
+        if SESSIONS is not None:
+            SESSIONS.close()
+        # Last, so errors reported above are written too. Workers started by
+        # serve.py leave with os._exit(), which skips the atexit flush.
+        LOG.flush()
+
 app = FastAPI(
     title="Loan Eligibility Chatbot Webhook",
     description="A robust API to handle loan eligibility checks for a chatbot.",
     version="2.2.0", # Version bump for age/number fallback logic
+    lifespan=lifespan,
+)
+
+# Buffered JSON-lines logger; set LOG_LEVEL=DEBUG to see the per-step details
+LOG = get_logger()
+
+# The loan rules, compiled into a dispatch table keyed by loan type, with every
+# reply rendered once per locale into a ready-to-send JSON body and, when NumPy
+# is installed, lookup tables for scoring whole batches at once. With RULES_FILE
+# set they come from that file and are reloaded when it changes; handlers read
+# RULE_STORE.current once per request.
+RULE_STORE = RuleStore(
+    os.getenv("RULES_FILE") or None,
+    poll_seconds=float(os.getenv("RULES_POLL_SECONDS", "2")),
+    on_reload=lambda snapshot: LOG.info("rules_reloaded", version=snapshot.version),
+    on_error=lambda exc: LOG.error("rules_reload_failed", error=f"{type(exc).__name__}: {exc}"),
+)
+# Interest rates by loan type, income band and tenure, reloaded like the rules.
+# With RATES_FILE set to an empty value each product's interest_rate is used.
+DEFAULT_RATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rates.json")
+RATES = RateStore(
+    os.getenv("RATES_FILE", DEFAULT_RATES_FILE) or None,
+    loan_types=lambda: RULE_STORE.current.rules.products,
+    poll_seconds=float(os.getenv("RULES_POLL_SECONDS", "2")),
+    on_reload=lambda catalog: LOG.info("rates_reloaded", version=catalog.version),
+    on_error=lambda exc: LOG.error("rates_reload_failed", error=f"{type(exc).__name__}: {exc}"),
 )
 
-def get_merged_parameters(query_result: QueryResult) -> Dict:
+# Opt-in: memoize decisions by which side of each threshold the inputs fall
+DECISION_CACHE_SIZE = int(os.getenv("DECISION_CACHE_SIZE", "0"))
+DECISION_CACHE = DecisionCache(DECISION_CACHE_SIZE) if DECISION_CACHE_SIZE > 0 else None
+
+# Loan type names, synonyms and intent flags, compiled into frozen lookups
+LOAN_TYPES = compile_resolver()
+
+# The context we set in the first intent; it carries the loan type across turns
+LOAN_DETAILS_CONTEXT = 'awaiting-loan-details'
+# Contexts (by short name) whose parameters are merged, highest priority first
+MERGE_CONTEXTS = ContextSelector([
+    name.strip() for name in os.getenv("MERGE_CONTEXTS", LOAN_DETAILS_CONTEXT).split(",") if name.strip()
+])
+
+# The intent answered with an EMI quote for the loan type instead of an
+# eligibility decision; it fills 'loan-amount' and optionally 'tenure'
+EMI_INTENT = os.getenv("EMI_INTENT", "EMI Calculator")
+EMI_QUOTED = "emi_quoted"
+EMI_INCOMPLETE = "emi_incomplete"
+EMI_UNAVAILABLE = "emi_unavailable"
+EMI_INCOMPLETE_TEXT = "How much would you like to borrow, and for how long? (e.g., 10 lakh for 20 years)"
+EMI_UNAVAILABLE_TEXT = "Sorry, I don't have current interest rates for {loan_type} loans."
+# Largest comparison table /emi computes in one call
+EMI_MAX_QUOTES = int(os.getenv("EMI_MAX_QUOTES", "10000"))
+
+# Eligible replies end with an estimate of the largest loan the user's income
+# supports (see affordability.py); set AFFORDABILITY_ESTIMATES=0 to leave it out
+ESTIMATE_AFFORDABILITY = os.getenv("AFFORDABILITY_ESTIMATES", "1") == "1"
+AFFORDABILITY = AffordabilityCache()
+
+# Opt-in: with AUDIT_LOG_DIR set, every webhook decision is appended to segment
+# files there by a background writer (see audit.py)
+AUDIT = get_audit_log(on_error=lambda exc: LOG.error("audit_write_failed", error=f"{type(exc).__name__}: {exc}"))
+
+# Opt-in: decode only the fields we read instead of validating the whole payload
+FAST_DECODE = os.getenv("WEBHOOK_FAST_DECODE", "0") == "1"
+
+# Opt-in: remember each session's parameters server-side so known sessions skip
+# the context scan. Dialogflow contexts expire after 20 minutes, hence the default TTL.
+# SESSION_BACKEND=sqlite keeps them in SESSION_DB_PATH instead, shared by every
+# worker on the host and kept across restarts.
+SESSIONS: Optional[Union[SessionStore, SqliteSessionStore]] = None
+if os.getenv("WEBHOOK_SESSION_STORE", "0") == "1":
+    if os.getenv("SESSION_BACKEND", "memory").lower() == "sqlite":
+        SESSIONS = SqliteSessionStore(
+            os.getenv("SESSION_DB_PATH", "sessions.db"),
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1200")),
+            max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "100000")),
+            flush_seconds=float(os.getenv("SESSION_FLUSH_SECONDS", "0.05")),
+            on_error=lambda exc: LOG.error("session_write_failed", error=f"{type(exc).__name__}: {exc}"),
+        )
+    else:
+        SESSIONS = SessionStore(
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1200")),
+            max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "100000")),
+        )
+
+# Requests that cannot be answered before Dialogflow gives up (about 5 s) are
+# answered straight away with this reply instead of waiting in the queue.
+BUSY_TEXT = "We're handling a lot of requests right now. Please send your last message again in a moment."
+ADMISSION: Optional[AdmissionController] = None
+if os.getenv("WEBHOOK_ADMISSION_CONTROL", "1") == "1":
+    ADMISSION = AdmissionController(
+        render_body(BUSY_TEXT),
+        max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "1024")),
+        deadline_seconds=float(os.getenv("WEBHOOK_DEADLINE_SECONDS", "5.0")),
+        safety_margin_seconds=float(os.getenv("ADMISSION_SAFETY_MARGIN_SECONDS", "0.5")),
+    )
+    app.add_middleware(AdmissionMiddleware, controller=ADMISSION, path="/webhook")
+
+# Opt-in: limit each session to WEBHOOK_RATE_LIMIT requests per second (with
+# bursts of RATE_LIMIT_BURST), optionally per client IP as well.
+RATE_LIMITED_TEXT = "You're sending messages too quickly. Please wait a moment and try again."
+RATE_LIMITED_BODY = render_body(RATE_LIMITED_TEXT)
+LIMITER: Optional[RateLimiter] = None
+LIMIT_BY_IP = os.getenv("RATE_LIMIT_BY_IP", "0") == "1"
+if float(os.getenv("WEBHOOK_RATE_LIMIT", "0")) > 0:
+    LIMITER = RateLimiter(
+        rate=float(os.getenv("WEBHOOK_RATE_LIMIT")),
+        burst=float(os.getenv("RATE_LIMIT_BURST", "10")),
+        max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "1000000")),
+    )
+
+# --- Metrics (exported at /metrics in the Prometheus text format) ---
+METRICS = Registry()
+STAGE_SECONDS = METRICS.histogram(
+    "webhook_stage_duration_seconds", "Time spent in each stage of the webhook.", ("stage",),
+)
+# Children resolved once so the hot path does not build label keys
+DECODE_TIME = STAGE_SECONDS.labels("decode")
+MERGE_TIME = STAGE_SECONDS.labels("merge")
+RESOLVE_TIME = STAGE_SECONDS.labels("resolve")
+EXTRACT_TIME = STAGE_SECONDS.labels("extract")
+EVALUATE_TIME = STAGE_SECONDS.labels("evaluate")
+SERIALIZE_TIME = STAGE_SECONDS.labels("serialize")
+REQUEST_TIME = METRICS.histogram(
+    "webhook_request_duration_seconds", "Time from reading the body to a serialized response.",
+).labels()
+DECISIONS = METRICS.counter(
+    "webhook_decisions_total", "Eligibility decisions by loan type and outcome.", ("loan_type", "outcome"),
+)
+METRICS.callback(
+    "webhook_rule_reloads_total", "Rule file reloads by result.", "counter",
+    lambda: {("success",): RULE_STORE.reloads, ("failure",): RULE_STORE.failures},
+    ("result",),
+)
+METRICS.callback(
+    "webhook_rules_info", "The rule set version in service.", "gauge",
+    lambda: {(RULE_STORE.current.version,): 1},
+    ("version",),
+)
+METRICS.callback(
+    "webhook_rate_reloads_total", "Rate file reloads by result.", "counter",
+    lambda: {("success",): RATES.reloads, ("failure",): RATES.failures},
+    ("result",),
+)
+METRICS.callback(
+    "webhook_rates_info", "The rate catalog version in service.", "gauge",
+    lambda: {(RATES.current.version,): 1},
+    ("version",),
+)
+METRICS.callback(
+    "webhook_log_records_dropped_total", "Log records dropped because the log queue was full.", "counter",
+    lambda: {(): LOG.dropped},
+)
+METRICS.callback(
+    "webhook_log_records_failed_total", "Log records skipped because they could not be serialised.", "counter",
+    lambda: {(): LOG.failed},
+)
+if AUDIT is not None:
+    METRICS.callback(
+        "webhook_audit_records_total", "Audit records by result: written, dropped (queue full) or failed (write or serialisation error).", "counter",
+        lambda: {(result,): AUDIT.stats()[result] for result in ("written", "dropped", "failed")},
+        ("result",),
+    )
+    METRICS.callback(
+        "webhook_audit_commits_total", "Batches of audit records written and fsynced.", "counter",
+        lambda: {(): AUDIT.commits},
+    )
+    METRICS.callback(
+        "webhook_audit_segments_total", "Audit segment files opened.", "counter",
+        lambda: {(): AUDIT.segments},
+    )
+if DECISION_CACHE is not None:
+    METRICS.callback(
+        "webhook_decision_cache_events_total", "Decision cache lookups and invalidations by event.", "counter",
+        lambda: {(event,): value for event, value in DECISION_CACHE.stats().items() if event != "entries"},
+        ("event",),
+    )
+    METRICS.callback(
+        "webhook_decision_cache_entries", "Decisions currently cached.", "gauge",
+        lambda: {(): len(DECISION_CACHE)},
+    )
+if SESSIONS is not None:
+    METRICS.callback(
+        "webhook_session_store_events_total", "Session store lookups and removals by event.", "counter",
+        lambda: {(event,): value for event, value in SESSIONS.stats().items() if event != "entries"},
+        ("event",),
+    )
+    METRICS.callback(
+        "webhook_session_store_entries", "Sessions currently held in memory.", "gauge",
+        lambda: {(): len(SESSIONS)},
+    )
+
+if ADMISSION is not None:
+    METRICS.callback(
+        "webhook_in_flight_requests", "Webhook requests currently being processed.", "gauge",
+        lambda: {(): ADMISSION.in_flight},
+    )
+    METRICS.callback(
+        "webhook_queued_requests", "Webhook requests waiting for a processing slot.", "gauge",
+        lambda: {(): ADMISSION.queued},
+    )
+    METRICS.callback(
+        "webhook_pending_requests", "Webhook requests received and not yet answered, processing or waiting.", "gauge",
+        lambda: {(): ADMISSION.pending},
+    )
+    METRICS.callback(
+        "webhook_oldest_queued_request_age_seconds", "How long the oldest queued webhook request has waited.", "gauge",
+        lambda: {(): ADMISSION.oldest_queue_age()},
+    )
+    METRICS.callback(
+        "webhook_service_time_estimate_seconds", "Moving average of the time between webhook completions, used for admission.", "gauge",
+        lambda: {(): ADMISSION.service_seconds},
+    )
+    METRICS.callback(
+        "webhook_shed_requests_total", "Webhook requests answered with the busy reply, by reason.", "counter",
+        lambda: {(reason,): count for reason, count in ADMISSION.shed.items()},
+        ("reason",),
+    )
+
+if LIMITER is not None:
+    METRICS.callback(
+        "webhook_rate_limit_decisions_total", "Rate limiter checks by result.", "counter",
+        lambda: {(result,): value for result, value in LIMITER.stats().items() if result != "buckets"},
+        ("result",),
+    )
+    METRICS.callback(
+        "webhook_rate_limit_buckets", "Token buckets currently held by the rate limiter.", "gauge",
+        lambda: {(): len(LIMITER)},
+    )
+
+# Either the validated models or the lightweight tuples from the fast path;
+# both expose the attributes the webhook logic reads.
+AnyWebhookRequest = Union[WebhookRequest, DecodedRequest]
+
+def decode_webhook_request(body: bytes) -> AnyWebhookRequest:
+    """
+    Turns a raw request body into a WebhookRequest.
+    In fast mode only the few fields the handler reads are extracted, into
+    plain tuples without validation; anything unexpected falls back to full
+    validation.
+    """
+    if FAST_DECODE:
+        decoded = fast_decode(body, MERGE_CONTEXTS.wants)
+        if decoded is not None:
+            return decoded
+
+    try:
+        return WebhookRequest.model_validate_json(body)
+    except ValidationError as exc:
+        # Report malformed bodies exactly like FastAPI's own body validation
+        raise RequestValidationError(exc.errors())
+
+def get_merged_parameters(query_result: Union[QueryResult, DecodedQueryResult]) -> Dict:
     """
     Merges parameters from the active context and the current query.
     This is the key to remembering the loan type across turns.
     """
     merged_params = {}
 
-    # 1. Get parameters from the context (the "memory")
-    if query_result.output_contexts:
-        for context in query_result.output_contexts:
-            # We look for the context we set in the first intent
-            if 'awaiting-loan-details' in context.name and context.parameters:
-                merged_params.update(context.parameters)
+    # 1. Get parameters from the contexts (the "memory") we set in earlier intents,
+    # matched by short name, e.g. awaiting-loan-details
+    MERGE_CONTEXTS.merge(query_result.output_contexts, merged_params)
 
     # 2. Get parameters from the current turn and overwrite
     # This ensures the newest info (like the age just provided) is used.
@@ -51,20 +346,11 @@ def get_merged_parameters(query_result: QueryResult) -> Dict:
 def determine_loan_type(params: Dict) -> Optional[str]:
     """
     Helper function to determine the loan type from the merged parameters.
+    The 'loan-type' entity wins (synonyms such as 'ghar' or 'Vahan' map to the
+    product name), then the intent flags in order: Home, Car, education,
+    personal, Business. See LOAN_TYPE_ALIASES in loan_types.py.
     """
-    if params.get('loan-type'):
-        return params['loan-type']
-    if params.get('Home_eligibility'):
-        return 'home'
-    if params.get('Car_eligibility'):
-        return 'car'
-    if params.get('education_eligibility') or params.get('edu_eligibility'):
-        return 'education'
-    if params.get('personal_eligibility'):
-        return 'personal'
-    if params.get('Business_eligibility'):
-        return 'business'
-    return None
+    return LOAN_TYPES.resolve(params)
 
 def get_parameter(params: Dict, param_name: str, fallback_name: Optional[str] = None) -> Any:
     """
@@ -91,90 +377,391 @@ def get_parameter(params: Dict, param_name: str, fallback_name: Optional[str] =
         
     return None
 
-# --- Webhook Endpoint ---
-@app.post("/webhook")
-async def loan_eligibility_webhook(request: WebhookRequest):
+def merge_request_parameters(webhook_request: AnyWebhookRequest) -> Dict:
     """
-    This function processes the incoming request from the chatbot,
-    checks for loan eligibility based on the provided parameters,
-    and returns a user-friendly response.
+    The conversation's parameters so far. A session we already know only needs
+    the current turn merged into its stored state, as long as that state still
+    agrees with the merged contexts. It may not: another worker (each has its
+    own memory store) may have handled turns this one never saw, or the context
+    may have expired and the conversation started over. Then the state is
+    rebuilt from the contexts, exactly as without a session store.
     """
-    start_time = time.time()
-    print("--- NEW REQUEST RECEIVED ---")
+    query_result = webhook_request.query_result
+    session_id = webhook_request.session
+    if SESSIONS is None or not session_id:
+        return get_merged_parameters(query_result)
+    remembered = MERGE_CONTEXTS.merge(query_result.output_contexts, {})
+    current = query_result.parameters
+    # Without a context to compare against, the conversation has (re)started
+    params = SESSIONS.merge(session_id, current) if remembered else None
+    if params is not None and all(
+        name in current or params.get(name) == value for name, value in remembered.items()
+    ):
+        return params
+    params = remembered
+    params.update(current)
+    SESSIONS.put(session_id, params)
+    return params
 
-    query_result = request.query_result
+def process_webhook_request(
+    webhook_request: AnyWebhookRequest, trace: bool = False, snapshot: Optional[RuleSnapshot] = None,
+    inputs: Optional[Dict[str, Any]] = None,
+) -> Decision:
+    """
+    The merge/extract/decide path behind the webhook, independent of HTTP so
+    captured traffic can be replayed through exactly the same logic.
+    Decisions come from `snapshot`, or the current rules when not given.
+    When `inputs` is given it is filled with the values the decision was
+    made from, for the audit log.
+    """
+    snapshot = snapshot or RULE_STORE.current
+    rules = snapshot.rules
+    now = time.perf_counter_ns
+    started = now()
     
     # Merge parameters from context and the current query
-    params = get_merged_parameters(query_result)
-    print(f"DEBUG: Merged parameters: {params}")
+    params = merge_request_parameters(webhook_request)
+    merged = now()
+    MERGE_TIME.observe_ns(merged - started)
+    if trace:
+        LOG.debug("merged_parameters", params=params)
     
     loan_type = determine_loan_type(params)
-    print(f"DEBUG: Determined loan type: {loan_type}")
+    resolved = now()
+    RESOLVE_TIME.observe_ns(resolved - merged)
+    if trace:
+        LOG.debug("loan_type_determined", loan_type=loan_type)
     
     # --- FIX APPLIED HERE ---
     # Added 'number' as a fallback for 'age' to handle cases where Dialogflow
     # uses the generic @sys.number entity.
-    age = get_parameter(params, 'age', fallback_name='number')
-    income = get_parameter(params, 'income', fallback_name='number') # This was already correct
+    # Free text such as "45,000", "50k" or "5 lakh" is parsed; anything that is
+    # not a number counts as missing, so the user is asked again.
+    age = parse_number(get_parameter(params, 'age', fallback_name='number'))
+    income = parse_number(get_parameter(params, 'income', fallback_name='number')) # This was already correct
     qualification = get_parameter(params, 'qualification')
+    extracted = now()
+    EXTRACT_TIME.observe_ns(extracted - resolved)
 
-    print(f"DEBUG: Extracted Age: {age}, Income: {income}, Qualification: {qualification}")
+    if trace:
+        LOG.debug("parameters_extracted", age=age, income=income, qualification=qualification)
+    if inputs is not None:
+        inputs.update(age=age, income=income, qualification=qualification)
 
-    response_text = "I'm sorry, I couldn't determine the loan type. Please specify if it's for a car, home, education, business, or personal use."
+    # --- Loan Eligibility Logic (compiled from the product table in rules.py) ---
+    if DECISION_CACHE is not None:
+        decision = DECISION_CACHE.evaluate(rules, loan_type, age, income, qualification)
+    else:
+        decision = rules.evaluate(loan_type, age, income, qualification)
+    # Tell eligible users roughly how much they could borrow; it depends on the
+    # exact income, so it is added after the (cacheable) decision
+    if ESTIMATE_AFFORDABILITY and decision.outcome == ELIGIBLE:
+        estimate = AFFORDABILITY.get(rules, RATES.current).describe(loan_type, age, income)
+        if estimate is not None:
+            decision = Decision(loan_type, ELIGIBLE, f"{decision.response_text} {estimate}", decision.version, estimate)
+    EVALUATE_TIME.observe_ns(now() - extracted)
+    DECISIONS.inc(decision.loan_type or "unknown", decision.outcome)
+    return decision
 
-    # --- Loan Eligibility Logic (Corrected and fully robust) ---
-    if loan_type == "home":
-        if age is not None and income is not None:
-            if int(age) >= 21 and int(income) >= 30000:
-                response_text = "Excellent! Based on your age and income, you are eligible for a home loan."
-            else:
-                response_text = "Sorry, you do not meet the criteria for a home loan. You must be at least 21 years old and have a minimum monthly income of ₹30,000."
-        else:
-            response_text = "To check your home loan eligibility, I need a few more details. What is your age and your monthly income?(e.g., My age is ** and I make ****)"
-
-    elif loan_type == "car":
-        if age is not None and income is not None:
-            if int(age) >= 18 and int(income) >= 20000:
-                response_text = "Great news! You are eligible for a car loan."
-            else:
-                response_text = "Sorry, you do not meet the criteria for a car loan. You must be at least 18 years old and have a minimum monthly income of ₹20,000."
-        else:
-            response_text = "To check your eligibility for a car loan, I need to know your age and monthly income(e.g., My age is ** and I make ****)."
-    
-    elif loan_type == "personal":
-        if age is not None and income is not None:
-            if int(age) >= 25 and int(income) >= 25000:
-                response_text = "Great news! You are eligible for a personal loan."
-            else:
-                response_text = "Sorry, you do not meet the criteria for a personal loan. You must be at least 25 years old and have a minimum monthly income of ₹25,000."
-        else:
-            response_text = "To check your eligibility for a personal loan, I need to know your age and monthly income(e.g., My age is ** and I make ****)."
-
-    elif loan_type == "education":
-        if age is not None and qualification is not None:
-            # Using .lower() and 'in' for more flexible matching of 'under graduate'
-            if "graduate" in str(qualification).lower() and int(age) <= 30:
-                response_text = "Congratulations! You are eligible for an education loan."
-            else:
-                response_text = "Sorry, you do not meet the criteria for an education loan. You must be a graduate and no older than 30."
-        else:
-            response_text = "To check your eligibility for an education loan, I need your age and qualification (e.g.,My age is ** and 'under graduate'or 'post graduate')."
-
-    elif loan_type == "business":
-        if income is not None:
-            if int(income) >= 40000:
-                response_text = "Fantastic! You are eligible for a business loan."
-            else:
-                response_text = "Sorry, to be eligible for a business loan, your minimum monthly income must be at least ₹40,000."
+def process_emi_request(
+    webhook_request: AnyWebhookRequest, trace: bool = False, snapshot: Optional[RuleSnapshot] = None,
+    inputs: Optional[Dict[str, Any]] = None,
+) -> Decision:
+    """
+    Answers the EMI intent: a quote for the amount asked about, over the
+    tenure asked about or the product's default tenure, at the catalogued
+    rate for that tenure and the user's income (or the product's
+    interest_rate when the catalog has none). `inputs` is filled as in
+    process_webhook_request.
+    """
+    rules = (snapshot or RULE_STORE.current).rules
+    params = merge_request_parameters(webhook_request)
+    loan_type = determine_loan_type(params)
+    spec = rules.products.get(loan_type) if isinstance(loan_type, str) else None
+    try:
+        # Read raw: get_parameter would keep a @sys.duration's amount and drop its unit
+        months = parse_tenure_months(params.get('tenure'), (spec or {}).get("max_tenure_months") or MAX_TENURE_MONTHS)
+        if months is None:
+            months = (spec or {}).get("tenure_months")
+    except ValueError:
+        # A tenure we cannot quote (e.g. in days, or 1000 years): ask again
+        # rather than quote the default as if the user had asked for it
+        months = None
+    income = parse_number(get_parameter(params, 'income'))
+    rate = RATES.current.rate(loan_type, income, months)
+    if rate is None and spec is not None:
+        rate = spec.get("interest_rate")
+    if spec is None:
+        decision = rules.unknown
+    elif rate is None:
+        decision = Decision(loan_type, EMI_UNAVAILABLE, EMI_UNAVAILABLE_TEXT.format(loan_type=loan_type), rules.version)
+    else:
+        principal = parse_number(get_parameter(params, 'loan-amount'))
+        if inputs is not None:
+            inputs.update(principal=principal, tenure_months=months, annual_rate=rate, income=income)
+        if trace:
+            LOG.debug("emi_parameters_extracted", loan_type=loan_type, principal=principal, tenure_months=months, annual_rate=rate)
+        try:
+            if principal is None or months is None:
+                raise ValueError("amount or tenure missing")
+            decision = Decision(loan_type, EMI_QUOTED, quote_text(loan_type, principal, rate, months), rules.version)
+        except ValueError:
+            # Missing, or nothing we can quote (e.g. a 70 year tenure); ask again
+            decision = Decision(loan_type, EMI_INCOMPLETE, EMI_INCOMPLETE_TEXT, rules.version)
+    DECISIONS.inc(decision.loan_type or "unknown", decision.outcome)
+    return decision
+
+def answer_webhook_request(
+    webhook_request: AnyWebhookRequest, trace: bool = False, snapshot: Optional[RuleSnapshot] = None,
+    inputs: Optional[Dict[str, Any]] = None,
+) -> Decision:
+    """
+    Routes a decoded request by intent: EMI quotes, otherwise eligibility.
+    """
+    if EMI_INTENT and webhook_request.query_result.intent.get("displayName") == EMI_INTENT:
+        return process_emi_request(webhook_request, trace, snapshot, inputs)
+    return process_webhook_request(webhook_request, trace, snapshot, inputs)
+
+def rate_limit_key(webhook_request: AnyWebhookRequest, client_host: Optional[str]) -> Optional[str]:
+    """
+    The rate limiter key for a request: its session, prefixed with the client
+    IP when RATE_LIMIT_BY_IP is set. Requests with neither are not limited.
+    """
+    session_id = webhook_request.session
+    if LIMIT_BY_IP and client_host:
+        return f"{client_host}|{session_id or ''}"
+    return session_id
+
+# --- Webhook Endpoint ---
+# The body is read raw so it can take the fast decode path (see decode_webhook_request)
+@app.post("/webhook")
+async def loan_eligibility_webhook(request: Request):
+    """
+    This function processes the incoming request from the chatbot,
+    checks for loan eligibility based on the provided parameters,
+    and returns a user-friendly response.
+    """
+    # Sampling is decided once so a logged request is logged from start to end
+    trace = LOG.sample()
+
+    body = await request.body()
+    start_time = time.perf_counter_ns()
+    webhook_request = decode_webhook_request(body)
+    decoded = time.perf_counter_ns()
+    DECODE_TIME.observe_ns(decoded - start_time)
+
+    if LIMITER is not None:
+        key = rate_limit_key(webhook_request, request.client.host if request.client else None)
+        if key is not None and not LIMITER.allow(key):
+            return Response(content=RATE_LIMITED_BODY, status_code=429, media_type=RESPONSE_CONTENT_TYPE)
+
+    # One snapshot for the whole request, so the reply always matches the decision
+    snapshot = RULE_STORE.current
+    inputs = {} if AUDIT is not None else None
+    decision = answer_webhook_request(webhook_request, trace, snapshot, inputs)
+    response_text = decision.response_text
+
+    # The body was serialized at startup; skip FastAPI's response encoding entirely
+    serialize_start = time.perf_counter_ns()
+    body = snapshot.responses.body(decision, webhook_request.query_result.language_code)
+    response = Response(content=body, media_type=RESPONSE_CONTENT_TYPE, headers={"x-rules-version": snapshot.version})
+    end_time = time.perf_counter_ns()
+    SERIALIZE_TIME.observe_ns(end_time - serialize_start)
+    REQUEST_TIME.observe_ns(end_time - start_time)
+
+    if trace:
+        duration = (end_time - start_time) / 1e6  # in milliseconds
+        LOG.debug("final_response", response_text=response_text)
+        LOG.info(
+            "request_processed", loan_type=decision.loan_type, outcome=decision.outcome,
+            rules_version=decision.version, duration_ms=round(duration, 3),
+        )
+    if AUDIT is not None:
+        AUDIT.record(
+            session=webhook_request.session, intent=webhook_request.query_result.intent.get("displayName"),
+            loan_type=decision.loan_type, outcome=decision.outcome, inputs=inputs,
+            rules_version=decision.version, rates_version=RATES.current.version,
+            latency_ms=round((end_time - start_time) / 1e6, 3),
+        )
+
+    return response
+
+# --- Batch Eligibility ---
+def _applicant_result(index: int, decision: Decision) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "loan_type": decision.loan_type,
+        "outcome": decision.outcome,
+        "eligible": decision.outcome == ELIGIBLE,
+        "fulfillmentText": decision.response_text,
+    }
+
+def _as_number(value: Any) -> float:
+    """
+    A parsed age or income as a kernel column value; missing values become NaN.
+    """
+    return math.nan if value is None else value
+
+def evaluate_applicants(records: List[Any], start: int = 0, snapshot: Optional[RuleSnapshot] = None) -> List[Dict[str, Any]]:
+    """
+    Scores a chunk of batch applicants with the same extraction helpers and
+    compiled rules as the webhook. Records look like
+    {"loan_type": "home", "age": 30, "income": 45000, "qualification": "..."}.
+    With NumPy installed the chunk is scored in one vectorized kernel pass,
+    otherwise row by row.
+    """
+    snapshot = snapshot or RULE_STORE.current
+    rules, kernel = snapshot.rules, snapshot.kernel
+    results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    columns = ([], [], [], [])
+    positions = []
+    for offset, record in enumerate(records):
+        index = start + offset
+        if not isinstance(record, dict):
+            results[offset] = {"index": index, "error": "Each applicant must be a JSON object."}
+            continue
+        params = {'loan-type': record.get('loan_type'), **record}
+        loan_type = determine_loan_type(params)
+        age = parse_number(get_parameter(params, 'age', fallback_name='number'))
+        income = parse_number(get_parameter(params, 'income', fallback_name='number'))
+        qualification = get_parameter(params, 'qualification')
+        if kernel is not None:
+            positions.append(offset)
+            for column, value in zip(columns, (loan_type, _as_number(age), _as_number(income), qualification)):
+                column.append(value)
+            continue
+        results[offset] = _applicant_result(index, rules.evaluate(loan_type, age, income, qualification))
+
+    if positions:
+        for offset, decision in zip(positions, kernel.decisions(*columns)):
+            results[offset] = _applicant_result(start + offset, decision)
+    return results
+
+@app.post("/eligibility/batch")
+async def batch_eligibility(request: Request):
+    """
+    Evaluates many applicants in one call. Accepts a JSON array, or NDJSON
+    when sent as application/x-ndjson, and streams one NDJSON result line per
+    applicant back in input order.
+    """
+    # The body is read up front: Starlette's StreamingResponse listens for client
+    # disconnects on the same receive channel, so it cannot be consumed lazily.
+    body = await request.body()
+    if is_ndjson(request.headers.get("content-type", "")):
+        records = iter_ndjson(body)
+    else:
+        try:
+            records = parse_json_array(body)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    # Every chunk of one batch is scored with the same rules, even across a reload
+    snapshot = RULE_STORE.current
+    return StreamingResponse(
+        stream_results(records, partial(evaluate_applicants, snapshot=snapshot)), media_type=NDJSON_MEDIA_TYPE,
+        headers={"x-rules-version": snapshot.version},
+    )
+
+# --- EMI Quotes ---
+class EmiRequest(BaseModel):
+    # Each of principal, annual_rate and tenure_months is one value or a list;
+    # a loan_type supplies the tenure when it is not given, and the rate for
+    # each tenure (at `income`, when given) from the rate catalog
+    loan_type: Optional[str] = None
+    income: Any = None
+    principal: Any = None
+    annual_rate: Any = None
+    tenure_months: Any = None
+    schedule: bool = False
+
+def _tenure_in_months(value: Any) -> Any:
+    # A bare number here is already months; text such as "5 years" is converted
+    return parse_number(value) if isinstance(value, (int, float)) else parse_tenure_months(value)
+
+def _emi_column(name: str, values: Any, parse) -> List[Any]:
+    values = values if isinstance(values, list) else [values]
+    try:
+        parsed = [parse(value) for value in values if value is not None]
+    except ValueError:  # e.g. a tenure in days
+        parsed = []
+    if not parsed or None in parsed:
+        raise HTTPException(status_code=400, detail=f"{name} must be a number or a list of numbers.")
+    return parsed
+
+@app.post("/emi")
+async def emi_quotes(emi_request: EmiRequest):
+    """
+    EMI, total payment and total interest for every combination of the given
+    principals, annual rates and tenures in one vectorized pass, plus the
+    amortization schedule when `schedule` is set and a single combination is
+    asked for.
+    """
+    snapshot = RULE_STORE.current
+    loan_type, spec = None, {}
+    if emi_request.loan_type is not None:
+        loan_type = LOAN_TYPES.normalize(emi_request.loan_type)
+        spec = snapshot.rules.products.get(loan_type)
+        if spec is None:
+            raise HTTPException(status_code=400, detail=f"Unknown loan type {emi_request.loan_type!r}.")
+    principals = _emi_column("principal", emi_request.principal, parse_number)
+    tenures = _emi_column("tenure_months", emi_request.tenure_months if emi_request.tenure_months is not None else spec.get("tenure_months"), _tenure_in_months)
+    # Without explicit rates, each tenure is quoted at its catalogued rate
+    loan_rates = RATES.current.loans.get(loan_type) if emi_request.annual_rate is None else None
+    if loan_rates is not None:
+        income = parse_number(emi_request.income)
+        rates = [loan_rates.rate(income, tenures[0])]
+    else:
+        rates = _emi_column("annual_rate", emi_request.annual_rate if emi_request.annual_rate is not None else spec.get("interest_rate"), parse_number)
+    combinations = len(principals) * len(rates) * len(tenures)
+    if combinations > EMI_MAX_QUOTES:
+        raise HTTPException(status_code=400, detail=f"At most {EMI_MAX_QUOTES} combinations can be quoted in one call.")
+    if emi_request.schedule and combinations != 1:
+        raise HTTPException(status_code=400, detail="A schedule needs exactly one principal, annual_rate and tenure_months.")
+    try:
+        if loan_rates is not None:
+            table = quote_by_tenure(principals, tenures, lambda months: loan_rates.rate(income, months))
         else:
-            response_text = "To check your eligibility for a business loan, I need to know your monthly income(e.g., My age is ** and I make ****)."
+            table = quote_grid(principals, rates, tenures)
+        result = {"loan_type": loan_type, "quotes": emi_rows(table)}
+        if emi_request.schedule:
+            result["schedule"] = emi_rows(amortization_schedule(principals[0], rates[0], tenures[0]))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError as exc:  # NumPy is not installed
+        raise HTTPException(status_code=503, detail=str(exc))
+    return JSONResponse(result, headers={"x-rules-version": snapshot.version, "x-rates-version": RATES.current.version})
 
-    end_time = time.time()
-    duration = (end_time - start_time) * 1000  # in milliseconds
-    print(f"DEBUG: Final response: {response_text}")
-    print(f"--- REQUEST PROCESSED IN {duration:.2f} ms ---")
+@app.get("/rates")
+def read_rates(
+    loan_type: Optional[str] = None, income: Optional[float] = None, tenure_months: Optional[int] = None,
+):
+    """
+    With a loan_type, the annual rate for that income and tenure (the lowest
+    band of either when not given); without one, every catalogued rate.
+    """
+    catalog = RATES.current
+    headers = {"x-rates-version": catalog.version}
+    if loan_type is None:
+        return JSONResponse(
+            {"version": catalog.version, "rates": {name: loan.rows() for name, loan in catalog.loans.items()}},
+            headers=headers,
+        )
+    normalized = LOAN_TYPES.normalize(loan_type)
+    rate = catalog.rate(normalized, income, tenure_months)
+    if rate is None:
+        raise HTTPException(status_code=404, detail=f"No rates for loan type {loan_type!r}.")
+    return JSONResponse(
+        {"loan_type": normalized, "income": income, "tenure_months": tenure_months, "annual_rate": rate, "version": catalog.version},
+        headers=headers,
+    )
 
-    return {"fulfillmentText": response_text}
+# --- Metrics Endpoint ---
+@app.get("/metrics")
+async def read_metrics():
+    """
+    Latency histograms per stage and decision counters for this worker.
+    Rendered on the event loop, the only thread that updates them.
+    """
+    return PlainTextResponse(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
 
 # --- Root Endpoint for Testing ---
 @app.get("/")
@@ -0,0 +1,169 @@
+# metrics.py
+# Per-worker latency histograms and counters, exported in the Prometheus text
+# format. Every update happens on the worker's event loop thread, so plain
+# integer increments are safe and no lock is taken on the request path.
+# Each worker process keeps its own registry; with several workers, scrape
+# them individually or aggregate with sum() in Prometheus.
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Bucket upper bounds in seconds, from 1 µs (rule evaluation) up to Dialogflow's 5 s deadline
+DEFAULT_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram fed with nanosecond durations.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds_s = tuple(buckets)
+        self.bounds_ns = tuple(int(round(bound * 1e9)) for bound in self.bounds_s)
+        self.counts = [0] * (len(self.bounds_ns) + 1)  # the last slot is +Inf
+        self.sum_ns = 0
+        self.count = 0
+
+    def observe_ns(self, duration_ns: int) -> None:
+        self.counts[bisect_left(self.bounds_ns, duration_ns)] += 1
+        self.sum_ns += duration_ns
+        self.count += 1
+
+    def reset(self) -> None:
+        self.counts = [0] * len(self.counts)
+        self.sum_ns = 0
+        self.count = 0
+
+    def render(self, name: str, labels: Labels) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds_s, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {self.count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(self.sum_ns / 1e9)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+class Family:
+    """
+    A named metric with one child per label combination.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.label_names = label_names
+        self.children: Dict[Labels, object] = {}
+
+    def _key(self, values: Tuple[str, ...]) -> Labels:
+        return tuple(zip(self.label_names, values))
+
+    def reset(self) -> None:
+        self.children.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in self.children.items():
+            if isinstance(child, Histogram):
+                lines.extend(child.render(self.name, labels))
+            else:
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(child)}")
+        return lines
+
+
+class HistogramFamily(Family):
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, "histogram", label_names)
+        self.buckets = tuple(buckets)
+
+    def reset(self) -> None:
+        # Children are zeroed in place because callers hold on to them
+        for child in self.children.values():
+            child.reset()
+
+    def labels(self, *values: str) -> Histogram:
+        key = self._key(values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = Histogram(self.buckets)
+        return child
+
+
+class CounterFamily(Family):
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, "counter", label_names)
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        key = self._key(values)
+        self.children[key] = self.children.get(key, 0) + amount
+
+
+class CallbackFamily(Family):
+    """
+    A gauge or counter whose samples are read from a callback at scrape time,
+    for values other components already track (queue depths, cache counters).
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, callback: Callable[[], Dict[Tuple[str, ...], float]], label_names: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, kind, label_names)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        self.children = {self._key(values): value for values, value in self.callback().items()}
+        return super().render()
+
+
+class Registry:
+    def __init__(self):
+        self.families: List[Family] = []
+
+    def _add(self, family: Family) -> Family:
+        self.families.append(family)
+        return family
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> HistogramFamily:
+        return self._add(HistogramFamily(name, help_text, label_names, buckets))
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> CounterFamily:
+        return self._add(CounterFamily(name, help_text, label_names))
+
+    def callback(self, name: str, help_text: str, kind: str, callback: Callable[[], Dict[Tuple[str, ...], float]], label_names: Tuple[str, ...] = ()) -> CallbackFamily:
+        return self._add(CallbackFamily(name, help_text, kind, callback, label_names))
+
+    def reset(self) -> None:
+        for family in self.families:
+            family.reset()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self.families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+# Content type Prometheus expects for the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,82 @@
+# numeric.py
+# Normalizes the ages and incomes users type into numbers the rules can compare.
+# Dialogflow usually sends numbers, but free text gets through as strings such
+# as "45,000", "50k", "5 lakh", "₹30000", "30000.0" or "45000 per month".
+import math
+import re
+from functools import lru_cache
+from typing import Any, Optional, Union
+
+Number = Union[int, float]
+
+# Indian and international multipliers, by the suffix a user may type
+MULTIPLIERS = {
+    "k": 1000, "thousand": 1000,
+    "l": 100000, "lac": 100000, "lacs": 100000, "lakh": 100000, "lakhs": 100000,
+    "cr": 10000000, "crore": 10000000, "crores": 10000000,
+    "m": 1000000, "mn": 1000000, "million": 1000000,
+}
+
+_NUMBER = re.compile(
+    r"""
+    (?:₹|rs\.?|inr|\$)?\s*                         # currency before the number
+    (?P<number>[-+]?
+        (?:(?:\d{1,3}(?:,\d{3})+                     # 1,234,567
+            |\d{1,2}(?:,\d{2})+,\d{3}                # 12,34,567 (lakh grouping)
+            |\d+)(?:\.\d*)?
+        |\.\d+))
+    \s*(?P<suffix>thousand|k|lakhs?|lacs?|l|crores?|cr|million|mn|m)?\.?  # k, lakh, crore, ...
+    \s*(?:₹|rs\.?|inr|rupees?|/-|years?|yrs?)?     # a currency or unit after it
+    \s*(?:(?:per|a)\s*month|monthly|p\.?\s*m\.?|/\s*(?:month|mo|m))?  # incomes are monthly already
+    """,
+    re.VERBOSE,
+)
+
+# Distinct strings remembered; users repeat the same few values a lot
+CACHE_SIZE = 4096
+
+
+def _normalize(value: float) -> Optional[Number]:
+    if not math.isfinite(value):
+        return None
+    # Multiplying "5.5" by a lakh leaves float noise; whole numbers come back as int
+    rounded = round(value, 6)
+    return int(rounded) if rounded.is_integer() else rounded
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_text(text: str) -> Optional[Number]:
+    """
+    Parses one free-text amount, or returns None when it is not a number.
+    """
+    match = _NUMBER.fullmatch(text.strip().lower())
+    if match is None:
+        return None
+    number = match.group("number").replace(",", "")
+    suffix = match.group("suffix")
+    if suffix is None:
+        try:
+            return int(number)  # the common case, exact for any length
+        except ValueError:
+            return _normalize(float(number))
+    return _normalize(float(number) * MULTIPLIERS[suffix])
+
+
+def parse_number(value: Any) -> Optional[Number]:
+    """
+    Turns an extracted age or income into an int or float, or None when it is
+    missing or cannot be read as a number. Accepts numbers, Dialogflow's
+    {"amount": ..., "currency": ...} objects and free text.
+    """
+    kind = type(value)
+    if kind is int:
+        return value
+    if kind is float:
+        return _normalize(value)
+    if kind is str:
+        return parse_text(value)
+    if kind is dict:
+        return parse_number(value.get("amount"))
+    if kind is list:
+        return parse_number(value[0]) if value else None
+    return None  # None, booleans and anything else
@@ -0,0 +1,277 @@
+# qualification.py
+# Classifies what users say about their education ("B.Tech", "12th pass",
+# "not a graduate") into an education level the rules can compare against.
+#
+# Every synonym and negation cue is compiled into one Aho-Corasick automaton,
+# so the text is scanned once however many synonyms there are. Matches must
+# start and end on word boundaries, a match contained in a longer one is
+# dropped ("graduate" inside "post graduate"), and a level preceded or
+# followed by a negation cue in the same clause does not count.
+from collections import deque
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class EducationLevel(IntEnum):
+    NONE = 0            # nothing recognized, or only negated qualifications
+    SCHOOL = 1          # 10th
+    HIGHER_SECONDARY = 2
+    DIPLOMA = 3
+    GRADUATE = 4        # includes students working towards a degree ("under graduate")
+    POSTGRADUATE = 5
+    DOCTORATE = 6
+
+
+# Written with dots where people use them; the dotless and spaced spellings
+# ("btech", "b tech") are generated when the automaton is compiled.
+QUALIFICATION_SYNONYMS: Dict[EducationLevel, Tuple[str, ...]] = {
+    EducationLevel.SCHOOL: (
+        "10th", "10th pass", "tenth", "class 10", "ssc", "sslc", "matric", "matriculation", "high school",
+    ),
+    EducationLevel.HIGHER_SECONDARY: (
+        "12th", "12th pass", "twelfth", "class 12", "hsc", "intermediate", "higher secondary", "senior secondary",
+        "puc", "plus two",
+    ),
+    EducationLevel.DIPLOMA: ("diploma", "polytechnic", "iti"),
+    EducationLevel.GRADUATE: (
+        "graduate", "graduated", "graduation", "under graduate", "undergraduate", "ug", "bachelor", "bachelors",
+        "bachelor's", "degree", "b.tech", "b.e.", "b.sc", "b.com", "b.a.", "bba", "bca", "b.pharm", "b.arch",
+        "b.ed", "mbbs", "bds", "llb", "ca", "chartered accountant",
+    ),
+    EducationLevel.POSTGRADUATE: (
+        "post graduate", "postgraduate", "post graduation", "pg", "master", "masters", "master's", "m.tech",
+        "m.e.", "m.sc", "m.com", "m.a.", "mba", "mca", "m.pharm", "m.ed", "llm", "md", "ms",
+    ),
+    EducationLevel.DOCTORATE: ("ph.d", "doctorate", "doctoral"),
+}
+
+# School levels are also matched followed by these words, so "high school
+# graduate" is a school level rather than a degree
+SCHOOL_COMPLETION_WORDS = ("graduate", "graduated")
+
+# Short synonyms that are also everyday words ("Ms", "CA" for California):
+# they count only as the whole value, after one of DEGREE_WORDS_BEFORE ("did
+# ms") or before one of DEGREE_WORDS_AFTER ("ms in physics")
+AMBIGUOUS_SYNONYMS = frozenset({"ms", "md", "ca"})
+DEGREE_WORDS_BEFORE = frozenset({"completed", "done", "did", "doing", "passed", "pursuing", "cleared"})
+DEGREE_WORDS_AFTER = frozenset({"degree", "in", "from", "completed", "done", "passed", "qualified", "holder", "final"})
+
+# Cues that negate a qualification mentioned shortly after them ...
+NEGATIONS_BEFORE = (
+    "not", "no", "non", "never", "without", "didn't", "didnt", "did not", "haven't", "have not", "hasn't",
+    "not yet", "yet to", "failed",
+)
+# ... or shortly before them
+NEGATIONS_AFTER = ("dropout", "drop out", "dropped out", "fail", "failed", "incomplete", "not completed")
+
+# How many words may separate a negation cue from the qualification it negates
+NEGATION_REACH_BEFORE = 3
+NEGATION_REACH_AFTER = 2
+CLAUSE_BREAKS = (",", ";", ":", " but ", " and ")
+
+_LEVEL, _BEFORE, _AFTER = "level", "before", "after"
+
+# Distinct qualification texts remembered
+CACHE_SIZE = 4096
+
+
+# Dotless spellings that are everyday words ("b.e." is not "be")
+AMBIGUOUS_SPELLINGS = frozenset({"be", "me"})
+
+
+def _normalize(text: str) -> str:
+    # Lower case, with hyphens, underscores and runs of whitespace as single spaces
+    text = text.casefold().replace("\u2019", "'").replace("-", " ").replace("_", " ")
+    return " ".join(text.split())
+
+
+def _spellings(synonym: str) -> Iterator[str]:
+    synonym = _normalize(synonym)
+    yield synonym
+    if "." in synonym:
+        stripped = synonym.rstrip(".")
+        yield stripped
+        if stripped.replace(".", "") not in AMBIGUOUS_SPELLINGS:
+            yield stripped.replace(".", "")
+        spaced = " ".join(stripped.replace(".", " ").split())
+        # "b tech", but not "m a", which would match inside "i'm a"
+        # "b. tech", as the dot is often followed by a space
+        dotted = " ".join(stripped.replace(".", ". ").split())
+        if len(spaced) > 3:
+            yield spaced
+            if "." in stripped:
+                yield dotted
+        elif synonym.endswith("."):
+            # "b. e." only with its closing dot, which sets it apart from text
+            yield dotted + "."
+
+
+class Match(NamedTuple):
+    start: int
+    end: int  # exclusive
+    kind: str
+    level: Optional[EducationLevel]
+
+
+class Automaton:
+    """
+    A plain Aho-Corasick automaton over characters: a trie with failure
+    links, reporting every (start, end, payload) occurrence in one scan.
+    """
+
+    def __init__(self, patterns: Dict[str, Tuple[str, Optional[EducationLevel]]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Tuple[str, Optional[EducationLevel]]]]] = [[]]
+        for pattern, payload in patterns.items():
+            state = 0
+            for char in pattern:
+                following = self._goto[state].get(char)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[state][char] = following
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = following
+            self._out[state].append((len(pattern), payload))
+
+        # Breadth-first, so every state's failure target is finished before it
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._out[following] = self._out[following] + self._out[self._fail[following]]
+
+    def scan(self, text: str) -> Iterator[Tuple[int, int, Tuple[str, Optional[EducationLevel]]]]:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in out[state]:
+                yield index + 1 - length, index + 1, payload
+
+
+def compile_automaton(
+    synonyms: Dict[EducationLevel, Tuple[str, ...]] = QUALIFICATION_SYNONYMS,
+    before: Tuple[str, ...] = NEGATIONS_BEFORE,
+    after: Tuple[str, ...] = NEGATIONS_AFTER,
+) -> Automaton:
+    patterns: Dict[str, Tuple[str, Optional[EducationLevel]]] = {}
+    for level, words in synonyms.items():
+        for word in words:
+            for spelling in _spellings(word):
+                patterns.setdefault(spelling, (_LEVEL, level))
+                if level <= EducationLevel.HIGHER_SECONDARY:
+                    # The longer match wins over the "graduate" inside it
+                    for completion in SCHOOL_COMPLETION_WORDS:
+                        patterns.setdefault(f"{spelling} {completion}", (_LEVEL, level))
+    # A cue can be both ("failed"); it is stored under one kind and checked for both
+    for word in before:
+        patterns.setdefault(_normalize(word), (_BEFORE, None))
+    for word in after:
+        patterns.setdefault(_normalize(word), (_AFTER, None))
+    return Automaton(patterns)
+
+
+AUTOMATON = compile_automaton()
+_BOTH_WAYS = frozenset(_normalize(word) for word in NEGATIONS_BEFORE) & frozenset(_normalize(word) for word in NEGATIONS_AFTER)
+
+
+def _on_word_boundaries(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+def _within_reach(text: str, gap_start: int, gap_end: int, reach: int) -> bool:
+    gap = text[gap_start:gap_end]
+    if any(mark in f" {gap} " for mark in CLAUSE_BREAKS):
+        return False
+    return len(gap.split()) <= reach
+
+
+def _stands_as_degree(text: str, match: Match) -> bool:
+    # An ambiguous synonym is the whole value, or has a degree word beside it
+    if text.strip(" .") == text[match.start:match.end]:
+        return True
+    before = text[:match.start].split()
+    after = text[match.end:].split()
+    return bool(before and before[-1] in DEGREE_WORDS_BEFORE) or bool(after and after[0].strip(".,;:") in DEGREE_WORDS_AFTER)
+
+
+def find_matches(text: str) -> List[Match]:
+    """
+    All whole-word matches in normalized `text`, with matches contained in a
+    longer one removed.
+    """
+    found = [
+        Match(start, end, kind, level)
+        for start, end, (kind, level) in AUTOMATON.scan(text)
+        if _on_word_boundaries(text, start, end)
+    ]
+    # Longest first at each start, then keep only matches not inside a kept one
+    found.sort(key=lambda match: (match.start, -match.end))
+    kept: List[Match] = []
+    covered_until = 0
+    for match in found:
+        if match.end <= covered_until:
+            continue
+        kept.append(match)
+        covered_until = max(covered_until, match.end)
+    return kept
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def classify_text(text: str) -> EducationLevel:
+    """
+    The highest education level the text claims, ignoring negated mentions.
+    """
+    normalized = _normalize(text)
+    matches = find_matches(normalized)
+    cues_before = [match for match in matches if match.kind == _BEFORE or normalized[match.start:match.end] in _BOTH_WAYS]
+    cues_after = [match for match in matches if match.kind == _AFTER or normalized[match.start:match.end] in _BOTH_WAYS]
+    best = EducationLevel.NONE
+    for match in matches:
+        if match.kind != _LEVEL or match.level <= best:
+            continue
+        if normalized[match.start:match.end] in AMBIGUOUS_SYNONYMS and not _stands_as_degree(normalized, match):
+            continue
+        if any(
+            cue.end <= match.start and _within_reach(normalized, cue.end, match.start, NEGATION_REACH_BEFORE)
+            for cue in cues_before
+        ):
+            continue
+        if any(
+            cue.start >= match.end and _within_reach(normalized, match.end, cue.start, NEGATION_REACH_AFTER)
+            for cue in cues_after
+        ):
+            continue
+        best = match.level
+    return best
+
+
+def classify_qualification(value: Any) -> EducationLevel:
+    """
+    Classifies an extracted qualification parameter; non-strings are read
+    as their text, like the rules always have.
+    """
+    return classify_text(value if isinstance(value, str) else str(value))
+
+
+def parse_level(name: str) -> EducationLevel:
+    """
+    Looks up a level by name as used in rule files, e.g. "graduate" or
+    "higher_secondary". Raises ValueError for unknown names.
+    """
+    try:
+        return EducationLevel[_normalize(name).replace(" ", "_").upper()]
+    except KeyError:
+        raise ValueError(f"unknown education level {name!r}; expected one of {', '.join(level.name.lower() for level in EducationLevel)}")
@@ -0,0 +1,175 @@
+# rate_catalog.py
+# Interest rates by loan type, monthly income band and tenure band, loaded
+# from a JSON or CSV file (rates.json ships with the defaults).
+#
+# Every row gives the rate from a minimum income and a minimum tenure
+# upwards. The rows are compiled into sorted floor arrays, so a lookup is two
+# bisects and no file is read while answering requests. The file is reloaded
+# like the rule file (see rule_store.py): a new catalog is built off to the
+# side and published with one assignment.
+import csv
+import hashlib
+import io
+import json
+import math
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Tuple
+
+from emi import MAX_ANNUAL_RATE
+from rule_store import RuleStore
+
+# Columns of a CSV rate file, and keys of each row in a JSON one
+COLUMNS = ("loan_type", "min_income", "min_tenure_months", "annual_rate")
+
+
+class LoanRates:
+    """
+    The rates of one loan type: for each income band (by its lowest monthly
+    income, ascending) the tenure bands (by their shortest tenure in months,
+    ascending) and their annual rates in percent.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[float, int, float]]):
+        bands: Dict[float, Dict[int, float]] = defaultdict(dict)
+        for min_income, min_tenure, annual_rate in rows:
+            bands[min_income][min_tenure] = annual_rate
+        self.income_floors: Tuple[float, ...] = tuple(sorted(bands))
+        self.tenure_floors: Tuple[Tuple[int, ...], ...] = tuple(tuple(sorted(bands[floor])) for floor in self.income_floors)
+        self.rates: Tuple[Tuple[float, ...], ...] = tuple(
+            tuple(bands[floor][tenure] for tenure in tenures)
+            for floor, tenures in zip(self.income_floors, self.tenure_floors)
+        )
+
+    def rate(self, income: Optional[float] = None, tenure_months: Optional[float] = None) -> float:
+        """
+        The rate for a monthly income and tenure. A missing income or tenure,
+        or one below the lowest band, gets the lowest band.
+        """
+        band = bisect_right(self.income_floors, income) - 1 if income is not None else 0
+        band = max(band, 0)
+        tenures = self.tenure_floors[band]
+        position = bisect_right(tenures, tenure_months) - 1 if tenure_months is not None else 0
+        return self.rates[band][max(position, 0)]
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [
+            {"min_income": floor, "min_tenure_months": tenure, "annual_rate": rate}
+            for floor, tenures, rates in zip(self.income_floors, self.tenure_floors, self.rates)
+            for tenure, rate in zip(tenures, rates)
+        ]
+
+
+class RateCatalog:
+    """
+    LoanRates by loan type, tagged with the version of the file they came from.
+    """
+
+    def __init__(self, loans: Dict[str, LoanRates], version: Optional[str] = None):
+        self.loans = loans
+        self.version = version
+
+    def rate(self, loan_type: Any, income: Optional[float] = None, tenure_months: Optional[float] = None) -> Optional[float]:
+        """
+        The annual rate in percent, or None for a loan type without rates.
+        """
+        loan = self.loans.get(loan_type) if isinstance(loan_type, str) else None
+        return loan.rate(income, tenure_months) if loan is not None else None
+
+
+EMPTY_CATALOG = RateCatalog({}, "none")
+
+
+def _number(row: Dict[str, Any], name: str, line: int) -> float:
+    value = row.get(name)
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = float(value)
+        if not math.isfinite(number):  # e.g. 1e999, which json reads as inf
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError(f"row {line}: {name} must be a number")
+    if not number >= 0:
+        raise ValueError(f"row {line}: {name} must not be negative")
+    return int(number) if number.is_integer() else number
+
+
+def compile_catalog(
+    rows: Iterable[Dict[str, Any]],
+    version: Optional[str] = None,
+    loan_types: Optional[Collection[str]] = None,
+) -> RateCatalog:
+    """
+    Builds a RateCatalog from rows shaped like COLUMNS. With `loan_types`,
+    rows for any other loan type are rejected. Raises ValueError naming the
+    first bad row.
+    """
+    by_loan: Dict[str, List[Tuple[float, int, float]]] = defaultdict(list)
+    for line, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            raise ValueError(f"row {line}: must be an object")
+        loan_type = row.get("loan_type")
+        if not isinstance(loan_type, str) or not loan_type.strip():
+            raise ValueError(f"row {line}: loan_type must be a name")
+        loan_type = loan_type.strip().lower()
+        if loan_types is not None and loan_type not in loan_types:
+            raise ValueError(f"row {line}: no loan product named {loan_type!r}")
+        annual_rate = _number(row, "annual_rate", line)
+        if annual_rate > MAX_ANNUAL_RATE:
+            raise ValueError(f"row {line}: annual_rate must be a percentage between 0 and {MAX_ANNUAL_RATE:g}")
+        min_tenure = _number(row, "min_tenure_months", line)
+        if min_tenure != int(min_tenure):
+            raise ValueError(f"row {line}: min_tenure_months must be a whole number")
+        by_loan[loan_type].append((_number(row, "min_income", line), int(min_tenure), annual_rate))
+    if not by_loan:
+        raise ValueError("rate file has no rates")
+    return RateCatalog({loan_type: LoanRates(rows) for loan_type, rows in by_loan.items()}, version)
+
+
+def load_rate_file(path: str, loan_types: Optional[Collection[str]] = None) -> RateCatalog:
+    """
+    Reads a rate file: CSV with a header row naming COLUMNS, or JSON shaped
+    {"version": "...", "rates": [{<COLUMNS>}, ...]}. Without a version the
+    catalog is tagged with a hash of the file contents.
+    """
+    with open(path, "rb") as handle:
+        raw = handle.read()
+    version = None
+    if path.lower().endswith(".csv"):
+        reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+        try:
+            missing = [column for column in COLUMNS if column not in (reader.fieldnames or ())]
+            rows = list(reader)
+        except csv.Error as exc:  # reported like any other bad file
+            raise ValueError(f"rate file is not valid CSV: {exc}")
+        if missing:
+            raise ValueError(f"rate file is missing the columns {', '.join(missing)}")
+    else:
+        data = json.loads(raw)
+        if not isinstance(data, dict) or not isinstance(data.get("rates"), list):
+            raise ValueError('rate file must contain {"rates": [...]}')
+        rows = data["rates"]
+        version = data.get("version")
+    return compile_catalog(rows, str(version or hashlib.sha1(raw).hexdigest()[:12]), loan_types)
+
+
+class RateStore(RuleStore):
+    """
+    Holds the current RateCatalog, loaded and reloaded exactly like the rule
+    file. Without a path it holds EMPTY_CATALOG, and callers fall back to
+    each product's interest_rate. `loan_types` returns the loan types in
+    service; a file with rates for any other is rejected.
+    """
+
+    thread_name = "rate-store"
+
+    def __init__(self, path: Optional[str] = None, loan_types: Optional[Callable[[], Collection[str]]] = None, **kwargs: Any):
+        self.loan_types = loan_types
+        super().__init__(path, **kwargs)
+
+    def _load(self, path: str) -> RateCatalog:
+        return load_rate_file(path, self.loan_types() if self.loan_types is not None else None)
+
+    def _default(self) -> RateCatalog:
+        return EMPTY_CATALOG
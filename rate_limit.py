@@ -0,0 +1,90 @@
+# rate_limit.py
+# Token-bucket rate limiting per conversation, so a client retrying the same
+# session in a loop cannot crowd out everyone else.
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+# Buckets touched while inserting a new key; expired ones are dropped
+SWEEP_PER_INSERT = 4
+
+
+class RateLimiter:
+    """
+    One token bucket per key, refilled lazily at `rate` tokens per second up
+    to `burst`. Buckets live in `shards` separately locked maps (lock striping)
+    so threads rarely contend. A bucket that has been idle long enough to
+    refill completely is indistinguishable from a new one, so it is dropped
+    during an incremental sweep and memory only grows with the active keys.
+    Each shard also holds at most max_keys / shards buckets, evicting the
+    least recently used.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        shards: int = 64,
+        max_keys: int = 1000000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        if shards & (shards - 1):
+            raise ValueError("shards must be a power of two")
+        self.rate = rate
+        self.burst = float(burst)
+        self.clock = clock
+        # A bucket untouched for this long is full again
+        self.idle_seconds = burst / rate
+        self._mask = shards - 1
+        self._max_per_shard = max(1, max_keys // shards)
+        # Each bucket is [tokens, last refill time], kept in last-use order
+        self._shards: List["OrderedDict[str, List[float]]"] = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self.allowed = 0
+        self.limited = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def allow(self, key: str) -> bool:
+        """
+        Takes one token from the key's bucket. Returns False when it is empty.
+        """
+        index = hash(key) & self._mask
+        shard = self._shards[index]
+        with self._locks[index]:
+            now = self.clock()
+            bucket = shard.get(key)
+            if bucket is None:
+                shard[key] = [self.burst - 1.0, now]
+                self._sweep(shard, now)
+                self.allowed += 1
+                return True
+            tokens = bucket[0] + (now - bucket[1]) * self.rate
+            if tokens > self.burst:
+                tokens = self.burst
+            bucket[1] = now
+            shard.move_to_end(key)
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                self.allowed += 1
+                return True
+            bucket[0] = tokens
+            self.limited += 1
+            return False
+
+    def _sweep(self, shard: "OrderedDict[str, List[float]]", now: float) -> None:
+        # Buckets are in last-use order, so the idle ones are at the front
+        for _ in range(SWEEP_PER_INSERT):
+            oldest_key, (_, updated) = next(iter(shard.items()))
+            if now - updated < self.idle_seconds:
+                break
+            del shard[oldest_key]
+        while len(shard) > self._max_per_shard:
+            shard.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"buckets": len(self), "allowed": self.allowed, "limited": self.limited}
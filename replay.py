@@ -0,0 +1,156 @@
+# replay.py
+# Replays captured Dialogflow webhook bodies (one JSON object per line) through
+# the same decode/merge/extract/decide path as /webhook, without starting the
+# HTTP server. Input is streamed, so memory use does not grow with file size.
+#
+#   python replay.py captured.jsonl -o results.jsonl --workers 8
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# Imported lazily (see _load_app) so command-line flags can configure it first
+_main = None
+
+Line = Tuple[int, bytes]
+
+
+def _load_app() -> None:
+    global _main
+    if _main is None:
+        import main
+        _main = main
+
+
+def read_lines(stream: Iterable[bytes]) -> Iterator[Line]:
+    """
+    Yields (line number, raw body) for every non-empty line.
+    """
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            yield number, line
+
+
+def replay_line(item: Line) -> Dict[str, Any]:
+    """
+    Runs one captured body through the webhook logic and times it.
+    """
+    _load_app()
+    number, body = item
+    started = time.perf_counter_ns()
+    try:
+        webhook_request = _main.decode_webhook_request(body)
+        decision = _main.answer_webhook_request(webhook_request)
+    except Exception as exc:  # Report bad records in place and keep going
+        return {"line": number, "error": f"{type(exc).__name__}: {exc}", "duration_us": _elapsed_us(started)}
+    return {
+        "line": number,
+        "session": webhook_request.session,
+        "loan_type": decision.loan_type,
+        "outcome": decision.outcome,
+        "fulfillmentText": decision.response_text,
+        "rules_version": decision.version,
+        "duration_us": _elapsed_us(started),
+    }
+
+
+def _elapsed_us(started: int) -> float:
+    return round((time.perf_counter_ns() - started) / 1000, 3)
+
+
+def replay_chunk(chunk: List[Line]) -> Tuple[str, Counter]:
+    """
+    Replays a chunk of lines and returns its results already serialised as
+    JSON lines, so only one string per chunk crosses the process boundary.
+    """
+    lines = []
+    counts: Counter = Counter()
+    for item in chunk:
+        result = replay_line(item)
+        counts[result.get("outcome", "error")] += 1
+        lines.append(json.dumps(result, ensure_ascii=False))
+    return "\n".join(lines) + "\n", counts
+
+
+def _batched(items: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def replay(lines: Iterator[Line], workers: int = 1, chunksize: int = 1024) -> Iterator[Tuple[str, Counter]]:
+    """
+    Yields (JSON lines, outcome counts) per chunk of input, in input order.
+    With several workers the chunks are handed to a process pool a bounded
+    window at a time, because Pool.imap would otherwise read the whole file
+    ahead of the workers.
+    """
+    chunks = _batched(lines, chunksize)
+    if workers <= 1:
+        for chunk in chunks:
+            yield replay_chunk(chunk)
+        return
+
+    import multiprocessing
+    with multiprocessing.Pool(workers, initializer=_load_app) as pool:
+        for window in _batched(chunks, workers * 4):
+            yield from pool.imap(replay_chunk, window)
+
+
+def write_results(results: Iterable[Tuple[str, Counter]], output: TextIO) -> Counter:
+    """
+    Writes each chunk of results and returns the combined per-outcome counts.
+    """
+    counts: Counter = Counter()
+    for text, chunk_counts in results:
+        output.write(text)
+        counts.update(chunk_counts)
+    return counts
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay captured webhook requests through the eligibility logic.")
+    parser.add_argument("input", help="JSONL file of WebhookRequest bodies ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="where to write JSONL results (default: stdout)")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="worker processes; 0 means one per CPU. Session state (WEBHOOK_SESSION_STORE) is per worker unless SESSION_BACKEND=sqlite",
+    )
+    parser.add_argument("--chunksize", type=int, default=1024, help="records handed to a worker at a time")
+    parser.add_argument("--fast-decode", action="store_true", help="use the fast decode path (WEBHOOK_FAST_DECODE=1)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.fast_decode:
+        os.environ["WEBHOOK_FAST_DECODE"] = "1"
+    workers = args.workers or os.cpu_count() or 1
+
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started = time.perf_counter()
+    try:
+        counts = write_results(replay(read_lines(source), workers, args.chunksize), output)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - started
+
+    total = sum(counts.values())
+    rate = total / elapsed if elapsed > 0 else 0.0
+    summary = ", ".join(f"{outcome}={count}" for outcome, count in sorted(counts.items()))
+    print(f"Replayed {total} records in {elapsed:.2f}s ({rate:,.0f}/s) with {workers} worker(s): {summary}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
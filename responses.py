@@ -0,0 +1,90 @@
+# responses.py
+# Every webhook reply is one of a small, fixed set of texts, so the complete
+# JSON bodies are rendered once at startup and the handler only picks one.
+import json
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from rules import UNKNOWN_DECISION, Decision, RuleSet
+
+DEFAULT_LOCALE = "en"
+
+CONTENT_TYPE = "application/json"
+
+# Distinct replies with a detail remembered (see ResponseCatalog.body)
+DETAIL_CACHE_SIZE = 4096
+
+
+def render_body(text: str) -> bytes:
+    """
+    Renders a reply exactly as Starlette's JSONResponse would.
+    """
+    return json.dumps(
+        {"fulfillmentText": text}, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+@lru_cache(maxsize=DETAIL_CACHE_SIZE)
+def _render_with_detail(text: str, detail: str) -> bytes:
+    return render_body(f"{text} {detail}")
+
+
+class ResponseCatalog:
+    """
+    Pre-serialized bodies for every (loan type, outcome) reply and locale.
+    Products may add translated replies under a "translations" key, e.g.
+    {"hi": {"eligible": "...", ...}}; locales without a translation fall back
+    to the default replies. A decision with a `detail` (text worked out for
+    that request) is rendered on demand as the reply followed by the detail.
+    Details are only written in the default language, so a translated reply
+    is sent without its detail rather than in two languages.
+    """
+
+    def __init__(
+        self,
+        rules: RuleSet,
+        unknown_translations: Optional[Dict[str, str]] = None,
+        default_locale: str = DEFAULT_LOCALE,
+    ):
+        self.default_locale = default_locale
+        self._bodies: Dict[Tuple[Optional[str], str], Dict[str, bytes]] = {}
+        self._texts: Dict[Tuple[Optional[str], str], Dict[str, str]] = {}
+
+        self._add(UNKNOWN_DECISION, UNKNOWN_DECISION.response_text, unknown_translations or {})
+        for loan_type, spec in rules.products.items():
+            translations = spec.get("translations", {})
+            for outcome, text in spec["responses"].items():
+                localized = {locale: texts[outcome] for locale, texts in translations.items() if outcome in texts}
+                self._add(Decision(loan_type, outcome, text), text, localized)
+
+    def _add(self, decision: Decision, text: str, localized: Dict[str, str]) -> None:
+        texts = {self.default_locale: text}
+        for locale, translated in localized.items():
+            texts[locale.lower()] = translated
+        self._texts[(decision.loan_type, decision.outcome)] = texts
+        self._bodies[(decision.loan_type, decision.outcome)] = {locale: render_body(text) for locale, text in texts.items()}
+
+    def _locale_key(self, variants: Dict[str, Any], locale: Optional[str]) -> str:
+        if locale:
+            locale = locale.lower()
+            if locale in variants:
+                return locale
+            language = locale.split("-", 1)[0]
+            if language in variants:
+                return language
+        return self.default_locale
+
+    def body(self, decision: Decision, locale: Optional[str] = None) -> bytes:
+        """
+        Returns the ready-to-send body for a decision. `locale` is Dialogflow's
+        languageCode, e.g. "hi" or "en-IN"; the region is ignored when there
+        is no exact match.
+        """
+        bodies = self._bodies.get((decision.loan_type, decision.outcome))
+        if bodies is None:
+            # Not a catalogued reply (e.g. built by other code); render it now
+            return render_body(decision.response_text)
+        key = self._locale_key(bodies, locale)
+        if decision.detail is not None and key == self.default_locale:
+            return _render_with_detail(self._texts[(decision.loan_type, decision.outcome)][key], decision.detail)
+        return bodies[key]
@@ -0,0 +1,191 @@
+# rule_store.py
+# Loan rules loaded from a JSON file and swapped in while the server runs.
+#
+# Everything derived from the rules (the compiled RuleSet, the response
+# catalog and the batch kernel) is built together into one immutable
+# snapshot. Reloading builds a new snapshot off to the side and publishes it
+# with a single attribute assignment, so request handlers read
+# `store.current` once and use it throughout without ever taking a lock.
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from emi import MAX_ANNUAL_RATE, MAX_TENURE_MONTHS
+from qualification import parse_level
+from responses import ResponseCatalog
+from rules import ELIGIBLE, FIELDS, INCOMPLETE, INELIGIBLE, RuleSet, compile_rules
+
+try:
+    from kernel import EligibilityKernel
+except ImportError:  # NumPy is optional; batches are then scored row by row
+    EligibilityKernel = None
+
+NUMERIC_THRESHOLDS = ("min_age", "max_age", "min_income")
+# The field each threshold reads; it must be required, or the check would see None
+THRESHOLD_FIELDS = {"min_age": "age", "max_age": "age", "min_income": "income", "qualification": "qualification"}
+OUTCOMES = (ELIGIBLE, INELIGIBLE, INCOMPLETE)
+
+
+class RuleSnapshot(NamedTuple):
+    version: str
+    rules: RuleSet
+    responses: ResponseCatalog
+    kernel: Optional["EligibilityKernel"]
+
+
+def build_snapshot(products: Optional[Dict[str, Dict[str, Any]]] = None, version: Optional[str] = None) -> RuleSnapshot:
+    """
+    Compiles a product table (the built-in one by default) and everything
+    derived from it.
+    """
+    rules = compile_rules(products, version)
+    kernel = EligibilityKernel(rules) if EligibilityKernel is not None else None
+    return RuleSnapshot(rules.version, rules, ResponseCatalog(rules), kernel)
+
+
+def validate_products(products: Any) -> Dict[str, Dict[str, Any]]:
+    """
+    Checks a product table read from a file and returns it in the shape
+    rules.py expects. Raises ValueError naming the first problem found.
+    """
+    if not isinstance(products, dict) or not products:
+        raise ValueError('"products" must be a non-empty object')
+    validated = {}
+    for loan_type, spec in products.items():
+        if not isinstance(spec, dict):
+            raise ValueError(f"{loan_type}: product must be an object")
+        required = spec.get("required")
+        if not isinstance(required, list) or not required or any(field not in FIELDS for field in required):
+            raise ValueError(f"{loan_type}: required must be a non-empty list of {', '.join(FIELDS)}")
+        for name, field in THRESHOLD_FIELDS.items():
+            if spec.get(name) is not None and field not in required:
+                raise ValueError(f"{loan_type}: {name} needs {field} in required")
+        for name in NUMERIC_THRESHOLDS:
+            value = spec.get(name)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+                raise ValueError(f"{loan_type}: {name} must be a whole number")
+        minimum = spec.get("qualification")
+        if minimum is not None:
+            if not isinstance(minimum, str):
+                raise ValueError(f"{loan_type}: qualification must be an education level name")
+            parse_level(minimum)  # raises ValueError naming the accepted levels
+        rate = spec.get("interest_rate")
+        if rate is not None and (isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 <= rate <= MAX_ANNUAL_RATE):
+            raise ValueError(f"{loan_type}: interest_rate must be an annual percentage between 0 and {MAX_ANNUAL_RATE:g}")
+        for name in ("tenure_months", "max_tenure_months"):
+            tenure = spec.get(name)
+            if tenure is not None and (isinstance(tenure, bool) or not isinstance(tenure, int) or not 1 <= tenure <= MAX_TENURE_MONTHS):
+                raise ValueError(f"{loan_type}: {name} must be a whole number from 1 to {MAX_TENURE_MONTHS}")
+        responses = spec.get("responses")
+        if not isinstance(responses, dict) or any(not isinstance(responses.get(outcome), str) for outcome in OUTCOMES):
+            raise ValueError(f"{loan_type}: responses must give a text for {', '.join(OUTCOMES)}")
+        translations = spec.get("translations", {})
+        if not isinstance(translations, dict) or any(not isinstance(texts, dict) for texts in translations.values()):
+            raise ValueError(f"{loan_type}: translations must map locales to response objects")
+        validated[loan_type] = dict(spec, required=tuple(required))
+    return validated
+
+
+def load_rule_file(path: str) -> RuleSnapshot:
+    """
+    Reads a rule file: {"version": "...", "products": {<loan type>: {...}}}
+    with products shaped like rules.LOAN_PRODUCTS. Without a version the
+    snapshot is tagged with a hash of the file contents.
+    """
+    with open(path, "rb") as handle:
+        raw = handle.read()
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("rule file must contain a JSON object")
+    products = validate_products(data.get("products"))
+    version = data.get("version") or hashlib.sha1(raw).hexdigest()[:12]
+    return build_snapshot(products, str(version))
+
+
+class RuleStore:
+    """
+    Holds the current RuleSnapshot. With a path, the file is loaded at
+    construction (errors propagate, so a bad file stops startup) and, once
+    start() is called, polled for changes by a background thread. A file that
+    fails to load later is reported through `on_error` and the previous
+    snapshot stays in service. Subclasses serve other reloadable files by
+    overriding _load and _default (see rate_catalog.py).
+    """
+
+    thread_name = "rule-store"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        poll_seconds: float = 2.0,
+        on_reload: Optional[Callable[[RuleSnapshot], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.on_reload = on_reload
+        self.on_error = on_error
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.failures = 0
+        if path is None:
+            self.current = self._default()
+        else:
+            self._stamp = self._file_stamp()
+            self.current = self._load(path)
+
+    def _load(self, path: str) -> RuleSnapshot:
+        return load_rule_file(path)
+
+    def _default(self) -> RuleSnapshot:
+        return build_snapshot()
+
+    def _file_stamp(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """
+        Reloads the file if it changed since the last look. Returns True when
+        a new snapshot was published.
+        """
+        if self.path is None:
+            return False
+        try:
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                return False
+            self._stamp = stamp
+            snapshot = self._load(self.path)
+        except Exception as exc:  # anything a bad file raises must not end the polling thread
+            self.failures += 1
+            if self.on_error is not None:
+                self.on_error(exc)
+            return False
+        self.current = snapshot  # the swap: one reference assignment
+        self.reloads += 1
+        if self.on_reload is not None:
+            self.on_reload(snapshot)
+        return True
+
+    def start(self) -> None:
+        """
+        Starts polling the file. Call it in each worker process: threads do
+        not survive fork().
+        """
+        if self.path is None or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            self.check()
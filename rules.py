@@ -0,0 +1,193 @@
+# rules.py
+# Declarative loan eligibility rules and the compiler that turns them into
+# a dispatch table of predicate closures.
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from qualification import classify_qualification, parse_level
+
+# --- Outcomes ---
+ELIGIBLE = "eligible"
+INELIGIBLE = "ineligible"
+INCOMPLETE = "incomplete"   # The product is known but a required field is missing
+UNKNOWN = "unknown"         # The loan type could not be determined
+
+UNKNOWN_LOAN_TYPE_TEXT = "I'm sorry, I couldn't determine the loan type. Please specify if it's for a car, home, education, business, or personal use."
+
+# --- Loan Products ---
+# Every product declares the fields it needs, its thresholds and its replies.
+# Supported thresholds: min_age, max_age, min_income and qualification (the lowest
+# education level accepted, by name, e.g. "graduate"; see qualification.py).
+# Loan terms for EMI quotes (see emi.py): interest_rate, the annual rate in percent
+# used when the rate catalog has none for the product (see rate_catalog.py), and
+# tenure_months, the tenure quoted when the user does not name one; max_tenure_months
+# caps the tenure of affordability estimates (see affordability.py).
+# A product may also carry "translations": {"<locale>": {<outcome>: "<reply>"}}
+# with localized replies (see responses.py).
+LOAN_PRODUCTS: Dict[str, Dict[str, Any]] = {
+    "home": {
+        "required": ("age", "income"),
+        "min_age": 21,
+        "min_income": 30000,
+        "interest_rate": 8.5,
+        "tenure_months": 240,
+        "max_tenure_months": 360,
+        "responses": {
+            ELIGIBLE: "Excellent! Based on your age and income, you are eligible for a home loan.",
+            INELIGIBLE: "Sorry, you do not meet the criteria for a home loan. You must be at least 21 years old and have a minimum monthly income of ₹30,000.",
+            INCOMPLETE: "To check your home loan eligibility, I need a few more details. What is your age and your monthly income?(e.g., My age is ** and I make ****)",
+        },
+    },
+    "car": {
+        "required": ("age", "income"),
+        "min_age": 18,
+        "min_income": 20000,
+        "interest_rate": 9.25,
+        "tenure_months": 60,
+        "max_tenure_months": 84,
+        "responses": {
+            ELIGIBLE: "Great news! You are eligible for a car loan.",
+            INELIGIBLE: "Sorry, you do not meet the criteria for a car loan. You must be at least 18 years old and have a minimum monthly income of ₹20,000.",
+            INCOMPLETE: "To check your eligibility for a car loan, I need to know your age and monthly income(e.g., My age is ** and I make ****).",
+        },
+    },
+    "personal": {
+        "required": ("age", "income"),
+        "min_age": 25,
+        "min_income": 25000,
+        "interest_rate": 11.5,
+        "tenure_months": 48,
+        "max_tenure_months": 60,
+        "responses": {
+            ELIGIBLE: "Great news! You are eligible for a personal loan.",
+            INELIGIBLE: "Sorry, you do not meet the criteria for a personal loan. You must be at least 25 years old and have a minimum monthly income of ₹25,000.",
+            INCOMPLETE: "To check your eligibility for a personal loan, I need to know your age and monthly income(e.g., My age is ** and I make ****).",
+        },
+    },
+    "education": {
+        "required": ("age", "qualification"),
+        "max_age": 30,
+        # Any degree or higher; 'under graduate' and 'post graduate' both count
+        "qualification": "graduate",
+        "interest_rate": 9.5,
+        "tenure_months": 84,
+        "max_tenure_months": 180,
+        "responses": {
+            ELIGIBLE: "Congratulations! You are eligible for an education loan.",
+            INELIGIBLE: "Sorry, you do not meet the criteria for an education loan. You must be a graduate and no older than 30.",
+            INCOMPLETE: "To check your eligibility for an education loan, I need your age and qualification (e.g.,My age is ** and 'under graduate'or 'post graduate').",
+        },
+    },
+    "business": {
+        "required": ("income",),
+        "min_income": 40000,
+        "interest_rate": 12.0,
+        "tenure_months": 60,
+        "max_tenure_months": 120,
+        "responses": {
+            ELIGIBLE: "Fantastic! You are eligible for a business loan.",
+            INELIGIBLE: "Sorry, to be eligible for a business loan, your minimum monthly income must be at least ₹40,000.",
+            INCOMPLETE: "To check your eligibility for a business loan, I need to know your monthly income(e.g., My age is ** and I make ****).",
+        },
+    },
+}
+
+FIELDS = ("age", "income", "qualification")
+
+# Version tag of the table above; rule files carry their own (see rule_store.py)
+BUILTIN_VERSION = "builtin"
+
+
+class Decision(NamedTuple):
+    loan_type: Optional[str]
+    outcome: str
+    response_text: str
+    # Version of the rule set that made the decision
+    version: Optional[str] = None
+    # Text worked out for this request and appended to the catalogued reply
+    # (already included in response_text), e.g. an affordability estimate
+    detail: Optional[str] = None
+
+
+UNKNOWN_DECISION = Decision(None, UNKNOWN, UNKNOWN_LOAN_TYPE_TEXT)
+
+Rule = Callable[[Any, Any, Any], Decision]
+
+
+def _compile_checks(spec: Dict[str, Any]) -> Tuple[Callable[[Any, Any, Any], bool], ...]:
+    """
+    Turns the thresholds of one product into a tuple of small predicates.
+    Ages and incomes arrive already parsed into numbers (see numeric.py);
+    int() only truncates fractions, as the original if/elif ladder did. The
+    qualification check runs first, in the ladder's order.
+    """
+    checks = []
+    if spec.get("qualification") is not None:
+        minimum = parse_level(spec["qualification"])
+        checks.append(lambda age, income, qualification: classify_qualification(qualification) >= minimum)
+    min_age = spec.get("min_age")
+    if min_age is not None:
+        checks.append(lambda age, income, qualification: int(age) >= min_age)
+    max_age = spec.get("max_age")
+    if max_age is not None:
+        checks.append(lambda age, income, qualification: int(age) <= max_age)
+    min_income = spec.get("min_income")
+    if min_income is not None:
+        checks.append(lambda age, income, qualification: int(income) >= min_income)
+    return tuple(checks)
+
+
+def compile_rule(loan_type: str, spec: Dict[str, Any], version: Optional[str] = None) -> Rule:
+    """
+    Compiles one product into a closure returning one of three prebuilt decisions.
+    """
+    responses = spec["responses"]
+    eligible = Decision(loan_type, ELIGIBLE, responses[ELIGIBLE], version)
+    ineligible = Decision(loan_type, INELIGIBLE, responses[INELIGIBLE], version)
+    incomplete = Decision(loan_type, INCOMPLETE, responses[INCOMPLETE], version)
+
+    required = tuple(FIELDS.index(field) for field in spec["required"])
+    checks = _compile_checks(spec)
+
+    def rule(age: Any, income: Any, qualification: Any) -> Decision:
+        values = (age, income, qualification)
+        for index in required:
+            if values[index] is None:
+                return incomplete
+        for check in checks:
+            if not check(age, income, qualification):
+                return ineligible
+        return eligible
+
+    return rule
+
+
+class RuleSet:
+    """
+    The compiled form of a product table: a dict from loan type to its rule,
+    so evaluating a request is one lookup plus a couple of comparisons.
+    Every decision it returns carries its `version`.
+    """
+
+    def __init__(self, products: Dict[str, Dict[str, Any]], version: Optional[str] = None):
+        self.products = products
+        self.version = version
+        self.unknown = UNKNOWN_DECISION._replace(version=version)
+        self.dispatch: Dict[str, Rule] = {
+            loan_type: compile_rule(loan_type, spec, version) for loan_type, spec in products.items()
+        }
+
+    def evaluate(self, loan_type: Optional[str], age: Any, income: Any, qualification: Any) -> Decision:
+        # Dialogflow may send a list or object as the loan type; treat it as unknown
+        rule = self.dispatch.get(loan_type) if isinstance(loan_type, str) else None
+        if rule is None:
+            return self.unknown
+        return rule(age, income, qualification)
+
+
+def compile_rules(products: Optional[Dict[str, Dict[str, Any]]] = None, version: Optional[str] = None) -> RuleSet:
+    """
+    Compiles the given products (the built-in table by default) into a RuleSet.
+    """
+    if products is None:
+        return RuleSet(LOAN_PRODUCTS, version or BUILTIN_VERSION)
+    return RuleSet(products, version)
@@ -0,0 +1,173 @@
+# serve.py
+# Production launcher: pre-forks one uvicorn worker per CPU.
+#
+#   python -m serve --port 8000 --workers 8
+#
+# The app is imported and warmed up in the parent before forking, so the
+# models, compiled rules and response catalog are shared copy-on-write by all
+# workers. Each worker binds its own listening socket with SO_REUSEPORT and
+# the kernel spreads incoming connections across them. The parent supervises
+# the workers and restarts any that die.
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import uvicorn
+
+# Back off when a worker keeps dying right after it starts
+CRASH_WINDOW_SECONDS = 1.0
+MAX_RESTART_DELAY_SECONDS = 5.0
+
+# A representative request for each reply path, used to warm up the app
+WARMUP_BODIES = [
+    b'{"queryResult": {"parameters": {"loan-type": "home", "age": 30, "income": 45000}, "intent": {}}}',
+    b'{"queryResult": {"parameters": {"age": 30}, "intent": {}, "outputContexts": '
+    b'[{"name": "projects/p/agent/sessions/s/contexts/awaiting-loan-details", "parameters": {"loan-type": "car"}}]}}',
+    b'{"queryResult": {"parameters": {}, "intent": {}}}',
+    b'{"queryResult": {"parameters": {"loan-type": "home", "loan-amount": "10 lakh"}, "intent": {"displayName": "EMI Calculator"}}}',
+]
+
+
+def warm_up() -> None:
+    """
+    Imports the app and runs every stage once so lazily initialised state
+    exists before forking, then freezes the heap so the garbage collector in
+    each worker does not write to (and un-share) the inherited objects.
+    """
+    import main
+    for body in WARMUP_BODIES:
+        webhook_request = main.decode_webhook_request(body)
+        decision = main.answer_webhook_request(webhook_request)
+        main.RULE_STORE.current.responses.body(decision, webhook_request.query_result.language_code)
+    main.METRICS.reset()  # warm-up requests are not traffic
+    gc.collect()
+    gc.freeze()
+
+
+def bind_socket(host: str, port: int, backlog: int, reuse_port: bool, listen: bool = True) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    if listen:
+        sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """
+    Forks the workers, restarts the ones that exit unexpectedly and forwards
+    SIGINT/SIGTERM to all of them on shutdown.
+    """
+
+    def __init__(self, config: uvicorn.Config, args: argparse.Namespace, shared_socket: Optional[socket.socket]):
+        self.config = config
+        self.args = args
+        # Without SO_REUSEPORT all workers accept on one socket bound here
+        self.shared_socket = shared_socket
+        self.workers: Dict[int, float] = {}  # pid -> start time
+        self.restart_delay = 0.0
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                sock = self.shared_socket or bind_socket(self.args.host, self.args.port, self.args.backlog, True)
+                uvicorn.Server(self.config).run(sockets=[sock])
+                code = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                # Never fall back into the supervisor loop in the child
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+
+    def stop(self, signum: int, frame) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+        print(f"Serving on {self.args.host}:{self.args.port} with {self.args.workers} worker(s)", file=sys.stderr)
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            print(f"Worker {pid} exited with status {code}; restarting", file=sys.stderr)
+            if time.monotonic() - started < CRASH_WINDOW_SECONDS:
+                self.restart_delay = min(MAX_RESTART_DELAY_SECONDS, max(0.1, self.restart_delay * 2))
+                time.sleep(self.restart_delay)
+            else:
+                self.restart_delay = 0.0
+            if not self.stopping:
+                self.spawn()
+        return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the loan eligibility webhook with pre-forked workers.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="default: one per CPU")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="warning", help="uvicorn's own log level")
+    parser.add_argument("--access-log", action="store_true", help="enable uvicorn's per-request access log")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    config = uvicorn.Config(
+        "main:app", host=args.host, port=args.port, backlog=args.backlog,
+        log_level=args.log_level, access_log=args.access_log,
+    )
+
+    if not hasattr(os, "fork"):
+        # No fork() (e.g. Windows): fall back to a single uvicorn process
+        print("fork() is not available; running a single worker", file=sys.stderr)
+        uvicorn.Server(config).run()
+        return 0
+
+    config.load()  # imports the app and uvicorn's protocol classes before forking
+    warm_up()
+
+    shared_socket = None
+    if hasattr(socket, "SO_REUSEPORT"):
+        # Fail fast if the port is taken, rather than crash-looping every worker.
+        # The probe never listens, so the kernel never routes a connection to it.
+        bind_socket(args.host, args.port, args.backlog, True, listen=False).close()
+    else:
+        shared_socket = bind_socket(args.host, args.port, args.backlog, False)
+    return Supervisor(config, args, shared_socket).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,440 @@
+# session_store.py
+# Conversation memory keyed by the Dialogflow session ID.
+# Once a session is known, the webhook merges the newest parameters into the
+# stored state instead of rebuilding it from the output contexts every turn.
+#
+# SessionStore keeps the sessions in the worker's memory. SqliteSessionStore
+# keeps them in a SQLite database in WAL mode, so they survive restarts and
+# every worker on the host shares them: reads go through an in-process cache
+# that SQLite's data_version tells us when to revalidate, and writes are
+# batched into one transaction by a background thread.
+import atexit
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class SessionStore:
+    """
+    A TTL + LRU map from session ID to the merged conversation parameters.
+    Entries expire `ttl_seconds` after their last update, and the least
+    recently used session is evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 1200.0,
+        max_entries: int = 100000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def merge(self, session_id: str, parameters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Merges the current turn's parameters into a known session and returns
+        the merged state, or returns None (a miss) if the session is unknown
+        or has expired. The stored dict is updated in place.
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        now = self.clock()
+        expires_at, state = entry
+        if expires_at <= now:
+            del self._entries[session_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        state.update(parameters)
+        self._entries[session_id] = (now + self.ttl_seconds, state)
+        self._entries.move_to_end(session_id)
+        return state
+
+    def put(self, session_id: str, state: Dict[str, Any]) -> None:
+        """
+        Stores the full state of a session, e.g. after rebuilding it from contexts.
+        """
+        now = self.clock()
+        self._entries[session_id] = (now + self.ttl_seconds, state)
+        self._entries.move_to_end(session_id)
+        # Entries are kept in update order and share one TTL, so expired
+        # sessions are always at the front and can be dropped cheaply here
+        while self._entries:
+            oldest_id, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[oldest_id]
+            self.expirations += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+    def close(self) -> None:
+        # Nothing to write out; here so either store can be shut down alike
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# --- SQLite backend ---
+SCHEMA = (
+    # Set before the table exists so freed pages can be returned (see _vacuum)
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    "id TEXT PRIMARY KEY, expires_at REAL NOT NULL, stamp INTEGER NOT NULL, state TEXT NOT NULL"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)",
+)
+# The statements are constants, so sqlite3's per-connection statement cache
+# prepares each of them once
+SELECT_SQL = "SELECT expires_at, stamp, state FROM sessions WHERE id = ?"
+UPSERT_SQL = (
+    "INSERT INTO sessions (id, expires_at, stamp, state) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET expires_at = excluded.expires_at, stamp = excluded.stamp, state = excluded.state"
+)
+DELETE_SQL = "DELETE FROM sessions WHERE id = ?"
+EXPIRE_SQL = "DELETE FROM sessions WHERE expires_at <= ?"
+DATA_VERSION_SQL = "PRAGMA data_version"
+
+# A cached session: [expires_at, stamp, state, generation it was last known current in]
+CacheEntry = List[Any]
+# A write waiting for the next batch: (expires_at, stamp, state), or None to delete
+PendingWrite = Optional[Tuple[float, int, Dict[str, Any]]]
+
+
+class SqliteSessionStore:
+    """
+    The SessionStore interface over a SQLite database shared by every worker
+    on the host.
+
+    Every row carries a random `stamp` that changes with each write. Reads
+    check `PRAGMA data_version`, which changes whenever another connection
+    commits, including this worker's own writer. The writer accounts for its
+    own commits: when no other worker committed in the meantime, the cache
+    stays current and the sessions in the batch are marked current too, so a
+    hit costs no query. Once another worker commits, the cache starts a new
+    generation and each cached session is revalidated by comparing stamps
+    once, and reloaded only if that worker changed it. Writes update the
+    cache at once and are committed together every `flush_seconds`, well
+    within the time a user takes to answer. Expired rows are deleted every
+    `vacuum_seconds`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 1200.0,
+        max_entries: int = 100000,
+        flush_seconds: float = 0.05,
+        vacuum_seconds: float = 60.0,
+        busy_timeout_seconds: float = 5.0,
+        clock: Callable[[], float] = time.time,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        # Sessions cached in this worker; the database holds them all
+        self.max_entries = max_entries
+        self.flush_seconds = flush_seconds
+        self.vacuum_seconds = vacuum_seconds
+        self.busy_timeout_seconds = busy_timeout_seconds
+        # Wall-clock time, as expiry times are shared between processes
+        self.clock = clock
+        self.on_error = on_error
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.reloads = 0
+        self.writes = 0
+        self.flushes = 0
+        self.vacuumed = 0
+        self.failures = 0
+        connection = self._connect()
+        try:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+        finally:
+            connection.close()
+        self._pid: Optional[int] = None
+        atexit.register(self.close)
+
+    def __len__(self) -> int:
+        return len(self._cache) if self._pid == os.getpid() else 0
+
+    def merge(self, session_id: str, parameters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Merges the current turn's parameters into a known session and returns
+        the merged state, or returns None (a miss) if the session is unknown
+        or has expired.
+        """
+        self._ensure_started()
+        with self._lock:
+            now = self.clock()
+            entry = self._lookup(session_id, now)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            state = entry[2]
+            state.update(parameters)
+            self._store(session_id, state, now)
+            return state
+
+    def put(self, session_id: str, state: Dict[str, Any]) -> None:
+        """
+        Stores the full state of a session, e.g. after rebuilding it from contexts.
+        """
+        self._ensure_started()
+        with self._lock:
+            self._store(session_id, state, self.clock())
+
+    def discard(self, session_id: str) -> None:
+        self._ensure_started()
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._write(session_id, None)
+
+    def close(self) -> None:
+        """
+        Commits the writes still waiting and stops the writer. Called at
+        interpreter exit.
+        """
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        if self._writer.is_alive() and self._writer is not threading.current_thread():
+            self._writer.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "reloads": self.reloads,
+            "writes": self.writes,
+            "flushes": self.flushes,
+            "vacuumed": self.vacuumed,
+            "failures": self.failures,
+        }
+
+    # --- Reads ---
+    def _lookup(self, session_id: str, now: float) -> Optional[CacheEntry]:
+        generation = self._current_generation()
+        entry = self._cache.get(session_id)
+        if entry is None:
+            with self._pending_lock:
+                unflushed = session_id in self._unflushed
+                write = self._pending[session_id] if session_id in self._pending else self._flushing.get(session_id)
+            if not unflushed:
+                entry = self._load(session_id, self._reader.execute(SELECT_SQL, (session_id,)).fetchone())
+            elif write is not None:
+                # Evicted from the cache before its write was committed
+                entry = [write[0], write[1], dict(write[2]), None]
+                self._cache[session_id] = entry
+        elif entry[3] != generation and session_id not in self._unflushed:
+            # Someone committed since we last looked; keep ours only if it is still theirs too
+            row = self._reader.execute(SELECT_SQL, (session_id,)).fetchone()
+            if row is not None and row[1] == entry[1]:
+                entry[0], entry[3] = row[0], self._generation
+            else:
+                entry = self._load(session_id, row)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._cache[session_id]
+            self.expirations += 1
+            return None
+        self._cache.move_to_end(session_id)
+        return entry
+
+    def _current_generation(self) -> Optional[int]:
+        """
+        Returns the generation a cached session must carry to be used without
+        a query, or None if this lookup has to check the database.
+        """
+        data_version = self._reader.execute(DATA_VERSION_SQL).fetchone()[0]
+        if data_version != self._seen_version:
+            if self._committing:
+                # Most likely our own batch, which _settle() accounts for
+                return None
+            self._seen_version = data_version
+            self._generation += 1
+        return self._generation
+
+    def _load(self, session_id: str, row: Optional[Tuple[float, int, str]]) -> Optional[CacheEntry]:
+        if row is None:
+            self._cache.pop(session_id, None)
+            return None
+        self.reloads += 1
+        entry = [row[0], row[1], json.loads(row[2]), self._generation]
+        self._cache[session_id] = entry
+        return entry
+
+    # --- Writes ---
+    def _store(self, session_id: str, state: Dict[str, Any], now: float) -> None:
+        expires_at = now + self.ttl_seconds
+        stamp = random.getrandbits(63)
+        entry = self._cache.get(session_id)
+        if entry is not None:
+            entry[0], entry[1], entry[2] = expires_at, stamp, state
+        else:
+            self._cache[session_id] = [expires_at, stamp, state, None]
+        self._cache.move_to_end(session_id)
+        # A shallow copy, so the writer thread never sees the dict mid-update
+        self._write(session_id, (expires_at, stamp, dict(state)))
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def _write(self, session_id: str, write: PendingWrite) -> None:
+        with self._pending_lock:
+            self._pending[session_id] = write
+            self._unflushed[session_id] = write[1] if write is not None else 0
+
+    # --- Background writer ---
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = WAL")
+        # Safe in WAL mode: a crash of the process loses nothing, a power cut at most the last batches
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        # Connections and threads do not survive a fork, so each worker opens its own
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._pending: Dict[str, PendingWrite] = {}
+        # The batch being committed
+        self._flushing: Dict[str, PendingWrite] = {}
+        # Stamp (0 for a delete) of every write not yet committed
+        self._unflushed: Dict[str, int] = {}
+        # The writer's data_version changes only when another connection
+        # commits. It is read before the reader's, so a commit in between
+        # costs a needless revalidation instead of going unnoticed.
+        connection = self._connect()
+        self._foreign_version = connection.execute(DATA_VERSION_SQL).fetchone()[0]
+        self._reader = self._connect()
+        self._seen_version = self._reader.execute(DATA_VERSION_SQL).fetchone()[0]
+        self._generation = 0
+        # Set while the writer commits, until _settle() has accounted for it
+        self._committing = False
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._run, args=(connection,), name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _run(self, connection: sqlite3.Connection) -> None:
+        vacuum_at = self.clock() + self.vacuum_seconds
+        try:
+            while not self._stop.wait(self.flush_seconds):
+                self._flush(connection)
+                if self.clock() >= vacuum_at:
+                    self._vacuum(connection)
+                    vacuum_at = self.clock() + self.vacuum_seconds
+            self._flush(connection)
+        finally:
+            connection.close()
+
+    def _flush(self, connection: sqlite3.Connection) -> None:
+        with self._pending_lock:
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+        if not batch:
+            return
+        upserts = [
+            (session_id, write[0], write[1], json.dumps(write[2], default=str, ensure_ascii=False))
+            for session_id, write in batch.items() if write is not None
+        ]
+        deletes = [(session_id,) for session_id, write in batch.items() if write is None]
+        self._committing = True
+        try:
+            with connection:  # one transaction, so one commit for the whole batch
+                connection.executemany(UPSERT_SQL, upserts)
+                connection.executemany(DELETE_SQL, deletes)
+        except sqlite3.Error as exc:
+            self._settle(connection, {})
+            # Keep the writes for the next flush, unless newer ones replaced them
+            with self._pending_lock:
+                for session_id, write in batch.items():
+                    self._pending.setdefault(session_id, write)
+                self._flushing = {}
+            self.failures += 1
+            if self.on_error is not None:
+                self.on_error(exc)
+            return
+        self._settle(connection, batch)
+        with self._pending_lock:
+            for session_id, write in batch.items():
+                if self._unflushed.get(session_id) == (write[1] if write is not None else 0):
+                    del self._unflushed[session_id]
+            self._flushing = {}
+        self.writes += len(batch)
+        self.flushes += 1
+
+    def _vacuum(self, connection: sqlite3.Connection) -> None:
+        self._committing = True
+        try:
+            with connection:
+                self.vacuumed += connection.execute(EXPIRE_SQL, (self.clock(),)).rowcount
+            # Hand the pages of the deleted rows back to the file system
+            connection.execute("PRAGMA incremental_vacuum").fetchall()
+        except sqlite3.Error as exc:
+            self.failures += 1
+            if self.on_error is not None:
+                self.on_error(exc)
+        finally:
+            self._settle(connection, {})
+
+    def _settle(self, connection: sqlite3.Connection, batch: Dict[str, PendingWrite]) -> None:
+        """
+        Accounts for a commit of the writer, so that this worker's own writes
+        do not make its cached sessions look stale.
+        """
+        with self._lock:
+            data_version = self._reader.execute(DATA_VERSION_SQL).fetchone()[0]
+            foreign_version = connection.execute(DATA_VERSION_SQL).fetchone()[0]
+            self._seen_version = data_version
+            self._committing = False
+            if foreign_version != self._foreign_version:
+                # Another worker committed as well: revalidate everything once
+                self._foreign_version = foreign_version
+                self._generation += 1
+                return
+            for session_id, write in batch.items():
+                entry = self._cache.get(session_id)
+                if write is not None and entry is not None and entry[1] == write[1]:
+                    entry[3] = self._generation
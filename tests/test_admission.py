@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from admission import SHED_DEADLINE, AdmissionController, AdmissionMiddleware
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    async def scenario():
+        controller = AdmissionController(b"{}", max_in_flight=1)
+        assert await controller.acquire(time.monotonic()) is None
+        queued = asyncio.ensure_future(controller.acquire(time.monotonic()))
+        await asyncio.sleep(0.01)
+        assert controller.queued == 1
+        queued.cancel()
+        await asyncio.sleep(0)
+        controller.release(time.monotonic())
+        assert controller.in_flight == 0
+        assert controller.pending == 0
+        assert await controller.acquire(time.monotonic()) is None
+        assert controller.in_flight == 1
+
+    run(scenario())
+
+
+def test_slot_granted_to_cancelled_waiter_is_passed_on():
+    async def scenario():
+        controller = AdmissionController(b"{}", max_in_flight=1)
+        assert await controller.acquire(time.monotonic()) is None
+        first = asyncio.ensure_future(controller.acquire(time.monotonic()))
+        second = asyncio.ensure_future(controller.acquire(time.monotonic()))
+        await asyncio.sleep(0.01)
+        controller.release(time.monotonic())  # hands the slot to `first`
+        first.cancel()  # ...which is cancelled before it resumes
+        assert await second is None
+        assert controller.in_flight == 1
+        controller.release(time.monotonic())
+        assert controller.in_flight == 0
+        assert controller.pending == 0
+
+    run(scenario())
+
+
+def test_overload_on_one_loop_is_shed():
+    work_seconds = 0.005
+    budget = 0.3
+
+    async def busy_app(scope, receive, send):
+        time.sleep(work_seconds)  # synchronous work, as in the webhook handler
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def scenario():
+        controller = AdmissionController(b"{}", deadline_seconds=budget, safety_margin_seconds=0.0)
+        middleware = AdmissionMiddleware(busy_app, controller)
+        scope = {"type": "http", "path": "/webhook"}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def one_request():
+            started = time.monotonic()
+            headers = {}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    headers.update(message["headers"])
+
+            await middleware(scope, receive, send)
+            return time.monotonic() - started, headers.get(b"x-load-shed")
+
+        # Warm up the service time estimate, then send a burst the worker
+        # cannot finish in time one after another.
+        for _ in range(5):
+            await one_request()
+        results = await asyncio.gather(*(one_request() for _ in range(200)))
+        return controller, results
+
+    controller, results = run(scenario())
+    shed = [elapsed for elapsed, reason in results if reason is not None]
+    served = [elapsed for elapsed, reason in results if reason is None]
+    assert shed and served
+    assert controller.shed[SHED_DEADLINE] == len(shed)
+    assert max(served) < budget + 2 * work_seconds
+    assert controller.pending == 0
+    assert controller.in_flight == 0
@@ -0,0 +1,17 @@
+import glob
+import os
+
+from audit import AuditLog, read_segment
+
+
+def test_unserialisable_record_does_not_lose_its_batch(tmp_path):
+    audit = AuditLog(str(tmp_path))
+    audit._writer_pid = os.getpid()  # no writer thread; flush() writes the batch
+    audit.record(outcome="eligible", session="a")
+    audit.record(outcome="eligible", inputs={("age", "income"): 1})
+    audit.record(outcome="not_eligible", session="b")
+    audit.flush()
+    records = [record for path in glob.glob(str(tmp_path / "*.jsonl")) for record in read_segment(path)]
+    assert [record["session"] for record in records] == ["a", "b"]
+    assert audit.stats()["failed"] == 1
+    assert audit.stats()["written"] == 2
@@ -0,0 +1,35 @@
+import pytest
+
+from emi import parse_tenure_months
+
+
+@pytest.mark.parametrize("value, months", [
+    (None, None),
+    ("", None),
+    ({"amount": "", "unit": "yr"}, None),
+    ({"amount": 5, "unit": "yr"}, 60),
+    ("15 years", 180),
+    ("60 months", 60),
+    (5, 60),
+    (60, 60),
+])
+def test_tenures_are_read_in_months(value, months):
+    assert parse_tenure_months(value) == months
+
+
+@pytest.mark.parametrize("value", [
+    "90 days",
+    {"amount": 90, "unit": "day"},
+    {"amount": 1e308, "unit": "year"},
+    "soon",
+    0,
+])
+def test_unusable_tenures_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_tenure_months(value)
+
+
+def test_tenure_is_bounded_by_the_product():
+    assert parse_tenure_months("7 years", max_months=84) == 84
+    with pytest.raises(ValueError, match="from 1 to 84 months"):
+        parse_tenure_months("8 years", max_months=84)
@@ -0,0 +1,57 @@
+import io
+import json
+import os
+import threading
+import time
+
+from logger import AsyncLogger
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_unserialisable_record_does_not_stop_the_writer():
+    stream = io.StringIO()
+    log = AsyncLogger(stream=stream)
+    circular = {}
+    circular["self"] = circular
+    log.info("bad_keys", params={("a", "b"): 1})
+    log.info("circular", params=circular)
+    log.info("after")
+    _wait_for(lambda: "after" in stream.getvalue())
+    assert log._writer.is_alive()
+    assert log.failed == 2
+    assert [json.loads(line)["event"] for line in stream.getvalue().splitlines()] == ["after"]
+
+
+def test_fields_are_copied_when_logged():
+    stream = io.StringIO()
+    log = AsyncLogger(stream=stream, max_queue=10)
+    log._writer_pid = os.getpid()  # no writer thread, so the record stays queued
+    params = {"age": 30}
+    log.info("merged_parameters", params=params)
+    params["income"] = 50000
+    log.flush()
+    assert json.loads(stream.getvalue())["params"] == {"age": 30}
+
+
+def test_concurrent_first_calls_start_one_writer(monkeypatch):
+    log = AsyncLogger(stream=io.StringIO())
+    started = []
+    start_writer = log._start_writer
+
+    def counting_start():
+        started.append(None)
+        time.sleep(0.01)  # widen the window two threads could both pass the check in
+        start_writer()
+
+    monkeypatch.setattr(log, "_start_writer", counting_start)
+    threads = [threading.Thread(target=log.info, args=("hello",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(started) == 1
@@ -0,0 +1,26 @@
+import pytest
+
+from numeric import parse_number
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("45,000", 45000),
+    ("50k", 50000),
+    ("5 lakh", 500000),
+    ("₹30000", 30000),
+    ("2.5 crore", 25000000),
+    ("25 years", 25),
+    ("12,34,567", 1234567),
+    ("1,234,567", 1234567),
+    ("45000 per month", 45000),
+    ("45,000/month", 45000),
+    ("₹45k pm", 45000),
+    ("45000 rupees a month", 45000),
+])
+def test_free_text_is_parsed(text, expected):
+    assert parse_number(text) == expected
+
+
+@pytest.mark.parametrize("text", ["1,2,3", "45,00", "1,2345", "abc", "45000 per year"])
+def test_malformed_text_is_rejected(text):
+    assert parse_number(text) is None
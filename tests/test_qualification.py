@@ -0,0 +1,30 @@
+import pytest
+
+from qualification import EducationLevel, classify_qualification
+
+
+@pytest.mark.parametrize("text, level", [
+    ("B.Tech", EducationLevel.GRADUATE),
+    ("BTech", EducationLevel.GRADUATE),
+    ("B Tech", EducationLevel.GRADUATE),
+    ("B. Tech", EducationLevel.GRADUATE),
+    ("b. sc in physics", EducationLevel.GRADUATE),
+    ("M. Tech", EducationLevel.POSTGRADUATE),
+    ("Ph. D", EducationLevel.DOCTORATE),
+    ("not a B. Tech", EducationLevel.NONE),
+    ("I'm. a student", EducationLevel.NONE),
+    ("B. E.", EducationLevel.GRADUATE),
+    ("M. A. in economics", EducationLevel.POSTGRADUATE),
+    ("high school graduate", EducationLevel.SCHOOL),
+    ("12th graduate", EducationLevel.HIGHER_SECONDARY),
+    ("hsc graduated", EducationLevel.HIGHER_SECONDARY),
+    ("MS", EducationLevel.POSTGRADUATE),
+    ("ms in computer science", EducationLevel.POSTGRADUATE),
+    ("Ms Priya Sharma", EducationLevel.NONE),
+    ("md from aiims", EducationLevel.POSTGRADUATE),
+    ("CA", EducationLevel.GRADUATE),
+    ("cleared ca", EducationLevel.GRADUATE),
+    ("lives in ca", EducationLevel.NONE),
+])
+def test_classify_qualification(text, level):
+    assert classify_qualification(text) == level
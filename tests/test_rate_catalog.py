@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from rate_catalog import compile_catalog, load_rate_file
+from rules import LOAN_PRODUCTS
+
+RATES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rates.json")
+
+
+def _row(**changes):
+    return dict({"loan_type": "home", "min_income": 0, "min_tenure_months": 1, "annual_rate": 8.5}, **changes)
+
+
+def test_shipped_rates_match_the_products():
+    catalog = load_rate_file(RATES_PATH, LOAN_PRODUCTS)
+    assert set(catalog.loans) <= set(LOAN_PRODUCTS)
+
+
+@pytest.mark.parametrize("rate", [100.5, 120])
+def test_rate_above_100_percent_is_rejected(rate):
+    with pytest.raises(ValueError, match="annual_rate"):
+        compile_catalog([_row(annual_rate=rate)])
+
+
+def test_unknown_loan_type_is_rejected():
+    with pytest.raises(ValueError, match="no loan product named 'boat'"):
+        compile_catalog([_row(), _row(loan_type="Boat")], loan_types=LOAN_PRODUCTS)
+
+
+def test_loan_types_are_not_checked_without_products():
+    assert compile_catalog([_row(loan_type="boat")]).rate("boat") == 8.5
+
+
+@pytest.mark.parametrize("column", ["min_income", "min_tenure_months", "annual_rate"])
+@pytest.mark.parametrize("value", [float("inf"), float("nan"), "1e999"])
+def test_non_finite_numbers_are_rejected(column, value):
+    with pytest.raises(ValueError, match=f"row 1: {column} must be a number"):
+        compile_catalog([_row(**{column: value})])
@@ -0,0 +1,30 @@
+import json
+
+from responses import ResponseCatalog
+from rules import ELIGIBLE, LOAN_PRODUCTS, Decision, compile_rules
+
+PRODUCTS = {
+    "home": dict(LOAN_PRODUCTS["home"], translations={"hi": {ELIGIBLE: "आप होम लोन के लिए पात्र हैं।"}}),
+}
+ESTIMATE = "You could borrow up to about ₹40,00,000 over 20 years."
+
+
+def _text(body):
+    return json.loads(body)["fulfillmentText"]
+
+
+def _decision():
+    text = PRODUCTS["home"]["responses"][ELIGIBLE]
+    return Decision("home", ELIGIBLE, f"{text} {ESTIMATE}", None, ESTIMATE)
+
+
+def test_default_language_reply_carries_the_detail():
+    catalog = ResponseCatalog(compile_rules(PRODUCTS))
+    for locale in (None, "en-IN", "ta"):  # "ta" has no translation, so the reply is English
+        assert _text(catalog.body(_decision(), locale)).endswith(ESTIMATE)
+
+
+def test_translated_reply_is_not_mixed_with_an_english_detail():
+    catalog = ResponseCatalog(compile_rules(PRODUCTS))
+    for locale in ("hi", "hi-IN"):
+        assert _text(catalog.body(_decision(), locale)) == "आप होम लोन के लिए पात्र हैं।"
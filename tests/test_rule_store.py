@@ -0,0 +1,71 @@
+import copy
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+from rule_store import RuleStore, validate_products
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "loan_rules.json")
+
+
+@pytest.fixture
+def products():
+    with open(RULES_PATH, encoding="utf-8") as handle:
+        return json.load(handle)["products"]
+
+
+def _one_product(products, **changes):
+    loan_type, spec = next(iter(products.items()))
+    return {loan_type: dict(copy.deepcopy(spec), **changes)}
+
+
+def test_shipped_rules_validate(products):
+    assert validate_products(products).keys() == products.keys()
+
+
+def test_empty_required_is_rejected(products):
+    with pytest.raises(ValueError, match="non-empty list"):
+        validate_products(_one_product(products, required=[]))
+
+
+@pytest.mark.parametrize("threshold, value, required", [
+    ("min_age", 21, ["income"]),
+    ("max_age", 60, ["income", "qualification"]),
+    ("min_income", 25000, ["age"]),
+    ("qualification", "graduate", ["age", "income"]),
+])
+def test_threshold_on_a_field_that_is_not_required_is_rejected(products, threshold, value, required):
+    spec = {"required": required, threshold: value}
+    for name in ("min_age", "max_age", "min_income", "qualification"):
+        spec.setdefault(name, None)
+    with pytest.raises(ValueError, match=f"{threshold} needs"):
+        validate_products(_one_product(products, **spec))
+
+
+def test_unexpected_load_error_keeps_the_watcher_polling(tmp_path):
+    path = tmp_path / "rules.json"
+    shutil.copy(RULES_PATH, path)
+    loads, errors = [], []
+
+    class FlakyStore(RuleStore):
+        def _load(self, path):
+            loads.append(path)
+            if len(loads) == 2:
+                raise TypeError("oddly shaped rules")
+            return super()._load(path)
+
+    store = FlakyStore(str(path), poll_seconds=0.01, on_error=errors.append)
+    store.start()
+    try:
+        deadline = time.monotonic() + 2
+        while store.reloads == 0 and time.monotonic() < deadline:
+            os.utime(path, ns=(time.time_ns(), time.time_ns()))
+            time.sleep(0.05)
+        assert store.failures == 1
+        assert isinstance(errors[0], TypeError)
+        assert store.reloads == 1
+    finally:
+        store.stop()
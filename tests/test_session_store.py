@@ -0,0 +1,40 @@
+import time
+
+from session_store import SqliteSessionStore
+
+
+def _selects(store):
+    statements = []
+    store._reader.set_trace_callback(statements.append)
+    return statements
+
+
+def test_own_writes_keep_the_cache_current(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"), flush_seconds=0.01)
+    try:
+        for i in range(10):
+            store.put(f"s{i}", {"n": i})
+        time.sleep(0.05)
+        statements = _selects(store)
+        for turn in range(3):
+            for i in range(10):
+                store.merge(f"s{i}", {"turn": turn})
+            time.sleep(0.05)  # let the writer commit this turn
+        assert not [s for s in statements if s.startswith("SELECT")]
+    finally:
+        store.close()
+
+
+def test_another_workers_write_is_seen(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    ours = SqliteSessionStore(path, flush_seconds=0.01)
+    theirs = SqliteSessionStore(path, flush_seconds=0.01)
+    try:
+        ours.put("s1", {"loan_type": "home"})
+        time.sleep(0.05)
+        theirs.put("s1", {"loan_type": "car"})
+        time.sleep(0.05)
+        assert ours.merge("s1", {})["loan_type"] == "car"
+    finally:
+        ours.close()
+        theirs.close()